@@ -1,36 +1,26 @@
 # app.py
 import streamlit as st
-from utils.calculate_max_mortgage_and_stamp_duty import calculate_mort_and_tax
+from utils.deal_pipeline import compute_deal, estimate_monthly_payment
+from utils.investment import project_investment
+from utils.refinance import refinance_grid
+from utils.new_build import DEFAULT_LINKAGE_SHARE, cost_distribution, simulate_index_paths, simulate_payment_plan
+from utils.prefetch import known_flow_defaults, summary_key
+from utils.summary import known_summary_data, unknown_summary_data, summary_excel_bytes
+from utils.currency import load_fx_rates, add_currency_columns
+from utils.scenario_link import KNOWN_FLOW, UNKNOWN_FLOW, encode_scenario, decode_scenario
+from utils.report import render_report
+from utils.listings import LISTINGS_PATH, ListingIndex
+from utils.rules import current_rules, rules_generation, start_rules_watcher
+from utils.calculation_log import open_calculation_log
+from utils.replacement_home import DEFAULT_BRIDGE_RATE, simulate_replacement
+from utils.eligibility import CONSTRAINT_LABELS, check_eligibility
+import os
+import numpy as np
 import pandas as pd
-from io import BytesIO
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 st.set_page_config(page_title="Apartment Journey", page_icon="🏠")
 
-# === Oleh Hadash purchase tax helper ===
-def calc_purchase_tax_oleh(price: float) -> float:
-    """
-    Purchase tax for Oleh Hadash (single residential home).
-    Brackets (approx., as commonly referenced):
-      0      – 1,978,745   : 0%
-      1,978,745 – 6,055,070: 0.5%
-      6,055,070 – 20,183,565: 8%
-      20,183,565+          : 10%
-    """
-    brackets = [
-        (0, 1_978_745, 0.00),
-        (1_978_745, 6_055_070, 0.005),
-        (6_055_070, 20_183_565, 0.08),
-        (20_183_565, float("inf"), 0.10),
-    ]
-    tax = 0.0
-    for lower, upper, rate in brackets:
-        if price <= lower:
-            break
-        taxable = min(price, upper) - lower
-        if taxable > 0:
-            tax += taxable * rate
-    return tax
-# === End of Oleh Hadash helper ===
-
 # --- simple router (one file) ---
 if "page" not in st.session_state:
     st.session_state.page = "home"
@@ -39,6 +29,132 @@ def go(page_name: str):
     st.session_state.page = page_name
     st.rerun()
 
+# --- business rules ---
+# data/rules.json is watched in the background and swapped in atomically when it changes.
+# Each rerun takes one snapshot so all of its numbers come from the same rules.
+@st.cache_resource
+def rules_watcher():
+    return start_rules_watcher()
+
+rules_watcher()
+rules = current_rules()
+vat_pct = f"{(rules.vat - 1) * 100:g}%"
+
+# --- batched input mode ---
+# Inside a form, widget changes are only sent when the form is submitted, so editing several
+# inputs costs one rerun instead of one per change
+batch_inputs = st.sidebar.checkbox("Batch input changes", value=True, help="Apply a group of inputs together with one button instead of recalculating after every change.")
+
+def input_group(form_key: str):
+    return st.form(form_key, border=False) if batch_inputs else nullcontext()
+
+def submit_input_group(label: str, form_key: str, values: list):
+    """
+    Add the form's submit button and count the reruns saved by this submit:
+    every changed input would have triggered its own rerun, the submit needs one.
+    """
+    if not batch_inputs:
+        return
+    st.form_submit_button(label, use_container_width=True)
+    submitted_values = st.session_state.setdefault("submitted_values", {})
+    previous = submitted_values.get(form_key)
+    if previous is not None:
+        changed = sum(old != new for old, new in zip(previous, values))
+        st.session_state.reruns_avoided = st.session_state.get("reruns_avoided", 0) + max(changed - 1, 0)
+    submitted_values[form_key] = values
+
+# --- display currencies ---
+# Deals are always computed in NIS; other currencies are only applied to the finished results
+fx_rates = load_fx_rates()
+display_currencies = st.sidebar.multiselect("Also show amounts in", options=[c for c in fx_rates if c != "NIS"])
+
+# --- usage log ---
+# Off unless APARTMENT_CALC_LOG_DIR is set, and then only for users who opt in.
+# Recording is an in-memory append; a background thread writes the files.
+@st.cache_resource
+def calculation_log():
+    return open_calculation_log()
+
+calc_log = calculation_log()
+share_usage = calc_log is not None and st.sidebar.checkbox("Share anonymous usage statistics", value=False, help="Record the prices and profiles you calculate, without any personal details, to help improve the calculator.")
+
+def log_calculation(page: str, **values):
+    """
+    Record a calculated scenario once per distinct set of inputs, if the user opted in.
+    """
+    if not share_usage:
+        return
+    key = (page, *values.values())
+    if st.session_state.get("last_logged") == key:
+        return
+    st.session_state.last_logged = key
+    calc_log.record(page, rules_generation=rules_generation(), **values)
+
+# --- listings ---
+@st.cache_resource
+def load_listing_index():
+    return ListingIndex.from_csv(LISTINGS_PATH)
+
+# --- background precompute of the known flow ---
+@st.cache_resource
+def prefetch_executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+def start_prefetch(price, mortgage_amount, is_israeli, is_first_apartment, is_oleh):
+    """
+    Compute the known_expenses / known_mortgage defaults and the summary Excel files in the background,
+    once per distinct set of deal basics.
+    """
+    key = (price, mortgage_amount, is_israeli, is_first_apartment, is_oleh)
+    prefetch = st.session_state.get("prefetch")
+    if prefetch is None or prefetch["key"] != (*key, rules_generation()):
+        st.session_state.prefetch = {"key": (*key, rules_generation()), "future": prefetch_executor().submit(known_flow_defaults, *key)}
+
+def prefetched_defaults():
+    """
+    The precomputed defaults for the current known_data, or None if they are not ready (or stale).
+    """
+    prefetch = st.session_state.get("prefetch")
+    data = st.session_state.get("known_data")
+    if prefetch is None or data is None or not prefetch["future"].done():
+        return None
+    key = (data['price'], data['mortgage_amount'], data['is_israeli'], data['is_first_apartment'], data['is_oleh'], rules_generation())
+    if prefetch["key"] != key or prefetch["future"].exception():
+        return None
+    return prefetch["future"].result()
+
+# --- shared scenario links ---
+# The rules generation is part of the cache key, so a rules change only recomputes links as they are opened
+@st.cache_data(max_entries=1000)
+def scenario_from_link(token: str, generation: int):
+    return decode_scenario(token)
+
+def share_link_button(data: dict, flow: int):
+    """
+    Put the scenario in the page URL so it can be copied and sent as a link.
+    """
+    if st.button("🔗 Share this calculation", use_container_width=True):
+        token = encode_scenario(data, flow)
+        st.session_state.loaded_scenario = token
+        st.query_params["s"] = token
+        st.info("The link in your browser's address bar now opens this calculation. Copy it and send it.")
+
+# Opening a shared link restores its inputs and jumps straight to the results
+shared_token = st.query_params.get("s")
+if shared_token and st.session_state.get("loaded_scenario") != shared_token:
+    st.session_state.loaded_scenario = shared_token
+    try:
+        flow, shared_data = scenario_from_link(shared_token, rules_generation())
+    except ValueError as e:
+        st.error(f"Could not open the shared calculation: {e}")
+    else:
+        if flow == KNOWN_FLOW:
+            st.session_state.known_data = dict(shared_data)
+            st.session_state.page = "known_summary"
+        else:
+            st.session_state.unknown_data = dict(shared_data)
+            st.session_state.page = "unknown_details"
+
 # --- HOME ---
 if st.session_state.page == "home":
     st.markdown(
@@ -72,24 +188,23 @@ elif st.session_state.page == "known_basics":
     st.title("✅ I already know the deal - Deal Basics")
     st.write("Great! Let's collect the basic details of your chosen apartment deal.")
     
-    # The user will enter the price of the deal he was offered in NIS
-    price = st.number_input("Enter the price of the deal (NIS)", min_value=0)
-    # The user will enter wether he is an Israeli citizen or not
-    is_israeli = st.checkbox("I am an Israeli citizen")
-    # The user will enter wether this is his first apartment or not
-    is_first_apartment = st.checkbox("This is my first apartment")
-    # The user will enter wether he is an Oleh Hadash or not
-    is_oleh = st.checkbox("I am an Oleh Hadash (new immigrant)")
-
-    # The user will enter the amount IN nis he wants to take as a mortgage
-    mortgage_amount = st.number_input("Enter the amount you want to take as a mortgage (NIS)", min_value=0)
+    with input_group("known_basics_form"):
+        # The user will enter the price of the deal he was offered in NIS
+        price = st.number_input("Enter the price of the deal (NIS)", min_value=0)
+        # The user will enter wether he is an Israeli citizen or not
+        is_israeli = st.checkbox("I am an Israeli citizen")
+        # The user will enter wether this is his first apartment or not
+        is_first_apartment = st.checkbox("This is my first apartment")
+        # The user will enter wether he is an Oleh Hadash or not
+        is_oleh = st.checkbox("I am an Oleh Hadash (new immigrant)")
+
+        # The user will enter the amount IN nis he wants to take as a mortgage
+        mortgage_amount = st.number_input("Enter the amount you want to take as a mortgage (NIS)", min_value=0)
+        submit_input_group("Calculate", "known_basics_form", [price, is_israeli, is_first_apartment, is_oleh, mortgage_amount])
     
     if price > 0:
-        mortgage, stamp_duty = calculate_mort_and_tax(price, is_israeli, is_first_apartment, mortgage_amount)
-
-        # Override with Oleh brackets if applicable
-        if is_oleh and is_first_apartment:
-            stamp_duty = calc_purchase_tax_oleh(price)
+        deal = compute_deal(price, mortgage_amount, is_israeli, is_first_apartment, is_oleh, rules=rules)
+        mortgage, stamp_duty = deal.max_mortgage, deal.stamp_duty
 
         if mortgage_amount > mortgage:
             st.error(f"The maximum mortgage you can take is {mortgage:,.0f} NIS. Please adjust your desired mortgage amount.")
@@ -108,6 +223,12 @@ elif st.session_state.page == "known_basics":
             'stamp_duty': stamp_duty
         }
 
+        # The next pages only need these inputs, so start computing their defaults now
+        if mortgage_amount <= mortgage:
+            start_prefetch(price, mortgage_amount, is_israeli, is_first_apartment, is_oleh)
+            log_calculation("known_basics", price=price, mortgage_amount=mortgage_amount, is_israeli=is_israeli,
+                            is_first_apartment=is_first_apartment, is_oleh=is_oleh, stamp_duty=stamp_duty)
+
     # Navigation buttons
     col1, col2 = st.columns(2)
     with col1:
@@ -130,6 +251,12 @@ elif st.session_state.page == "known_expenses":
         data = st.session_state.known_data
         price = data['price']
         mortgage_amount = data['mortgage_amount']
+        # Default fees come from the background precompute when it is ready
+        defaults = prefetched_defaults()
+        if defaults:
+            default_deal = defaults['deals'][20]
+        else:
+            default_deal = compute_deal(price, mortgage_amount, data['is_israeli'], data['is_first_apartment'], data['is_oleh'], rules=rules)
         
         st.write("Now, let's gather information about any additional expenses related to your apartment deal.")
         
@@ -141,17 +268,17 @@ elif st.session_state.page == "known_expenses":
             agent_fee_pct = st.number_input("Enter the agent fee percentage (%)", min_value=0.0, max_value=100.0, step=0.1)
             agent_fee_nis = st.number_input("Or enter the agent fee amount (NIS)", min_value=0)
             if agent_fee_pct > 0:
-                agent_fee = price * (agent_fee_pct / 100) * 1.18
-                st.info(f"The agent fee based on the percentage is {agent_fee:,.0f} NIS. (Including 18% VAT)")
+                agent_fee = price * (agent_fee_pct / 100) * rules.vat
+                st.info(f"The agent fee based on the percentage is {agent_fee:,.0f} NIS. (Including {vat_pct} VAT)")
             elif agent_fee_nis > 0:
-                agent_fee = agent_fee_nis * 1.18
-                st.info(f"Agent fee: {agent_fee:,.0f} NIS. (Including 18% VAT)")
+                agent_fee = agent_fee_nis * rules.vat
+                st.info(f"Agent fee: {agent_fee:,.0f} NIS. (Including {vat_pct} VAT)")
             else:
                 st.warning("Please enter either a percentage or amount for the agent fee.")
                 agent_fee = 0
         else:
-            agent_fee = price * 0.015 * 1.18
-            st.info(f"Using default agent fee: {agent_fee:,.0f} NIS (1.5% + 18% VAT)")
+            agent_fee = default_deal.agent_fee
+            st.info(f"Using default agent fee: {agent_fee:,.0f} NIS ({rules.agent_fee_rate * 100:g}% + {vat_pct} VAT)")
         
         # Lawyer fee section
         st.subheader("Lawyer Fee")
@@ -161,17 +288,17 @@ elif st.session_state.page == "known_expenses":
             lawyer_fee_pct = st.number_input("Enter the lawyer fee percentage (%)", min_value=0.0, max_value=100.0, step=0.1)
             lawyer_fee_nis = st.number_input("Or enter the lawyer fee amount (NIS)", min_value=0)
             if lawyer_fee_pct > 0:
-                lawyer_fee = price * (lawyer_fee_pct / 100) * 1.18
-                st.info(f"The lawyer fee based on the percentage is {lawyer_fee:,.0f} NIS. (Including 18% VAT)")
+                lawyer_fee = price * (lawyer_fee_pct / 100) * rules.vat
+                st.info(f"The lawyer fee based on the percentage is {lawyer_fee:,.0f} NIS. (Including {vat_pct} VAT)")
             elif lawyer_fee_nis > 0:
-                lawyer_fee = lawyer_fee_nis * 1.18
-                st.info(f"Lawyer fee: {lawyer_fee:,.0f} NIS. (Including 18% VAT)")
+                lawyer_fee = lawyer_fee_nis * rules.vat
+                st.info(f"Lawyer fee: {lawyer_fee:,.0f} NIS. (Including {vat_pct} VAT)")
             else:
                 st.warning("Please enter either a percentage or amount for the lawyer fee.")
                 lawyer_fee = 0
         else:
-            lawyer_fee = price * 0.01 * 1.18
-            st.info(f"Using default lawyer fee: {lawyer_fee:,.0f} NIS (1% + 18% VAT)")
+            lawyer_fee = default_deal.lawyer_fee
+            st.info(f"Using default lawyer fee: {lawyer_fee:,.0f} NIS ({rules.lawyer_fee_rate * 100:g}% + {vat_pct} VAT)")
 
         # Mortgage advisor fee section
         st.subheader("Mortgage Advisor Fee")
@@ -181,11 +308,11 @@ elif st.session_state.page == "known_expenses":
             mortgage_advisor_fee_pct = st.number_input("Enter the mortgage advisor fee percentage (%)", min_value=0.0, max_value=100.0, step=0.1)
             mortgage_advisor_fee_nis = st.number_input("Or enter the mortgage advisor fee amount (NIS)", min_value=0)
             if mortgage_advisor_fee_pct > 0:
-                mortgage_advisor_fee = mortgage_amount * (mortgage_advisor_fee_pct / 100) * 1.18
-                st.info(f"The mortgage advisor fee based on the percentage is {mortgage_advisor_fee:,.0f} NIS. (Including 18% VAT)")
+                mortgage_advisor_fee = mortgage_amount * (mortgage_advisor_fee_pct / 100) * rules.vat
+                st.info(f"The mortgage advisor fee based on the percentage is {mortgage_advisor_fee:,.0f} NIS. (Including {vat_pct} VAT)")
             elif mortgage_advisor_fee_nis > 0:
-                mortgage_advisor_fee = mortgage_advisor_fee_nis * 1.18
-                st.info(f"Mortgage advisor fee: {mortgage_advisor_fee:,.0f} NIS. (Including 18% VAT)")
+                mortgage_advisor_fee = mortgage_advisor_fee_nis * rules.vat
+                st.info(f"Mortgage advisor fee: {mortgage_advisor_fee:,.0f} NIS. (Including {vat_pct} VAT)")
             else:
                 st.warning("Please enter either a percentage or amount for the mortgage advisor fee.")
                 mortgage_advisor_fee = 0
@@ -195,8 +322,8 @@ elif st.session_state.page == "known_expenses":
                 mortgage_advisor_fee = 0
                 st.info("No mortgage taken, so no mortgage advisor fee.")
             else:
-                mortgage_advisor_fee = max(7500, mortgage_amount * 0.01) * 1.18
-                st.info(f"Using default mortgage advisor fee: {mortgage_advisor_fee:,.0f} NIS (min. 7500 NIS or 1% + 18% VAT)")
+                mortgage_advisor_fee = default_deal.mortgage_advisor_fee
+                st.info(f"Using default mortgage advisor fee: {mortgage_advisor_fee:,.0f} NIS (min. {rules.min_advisor_fee:,} NIS or {rules.advisor_fee_rate * 100:g}% + {vat_pct} VAT)")
         
         # Update session state with expenses
         st.session_state.known_data.update({
@@ -230,10 +357,11 @@ elif st.session_state.page == "known_mortgage":
         st.write(f"You have chosen to take a mortgage of {mortgage_amount:,.0f} NIS.")
         
         mortgage_years = st.selectbox("Select the mortgage term (years)", options=[20, 30], index=0)
-        if mortgage_years == 30:
-            monthly_payment = (mortgage_amount / 1000000) * 5550
+        defaults = prefetched_defaults()
+        if defaults:
+            monthly_payment = defaults['deals'][mortgage_years].monthly_payment
         else:
-            monthly_payment = (mortgage_amount / 1000000) * 6700
+            monthly_payment = estimate_monthly_payment(mortgage_amount, mortgage_years, rules)
         st.write(f"Your estimated monthly mortgage payment is {monthly_payment:,.0f} NIS.")
         
         # Update session state
@@ -261,34 +389,58 @@ elif st.session_state.page == "known_summary":
             go("known_basics")
     else:
         data = st.session_state.known_data
+        # One pipeline run with the chosen fees gives every number on this page and in the exports
+        deal = compute_deal(data['price'], data['mortgage_amount'], data['is_israeli'], data['is_first_apartment'], data['is_oleh'],
+                            data['mortgage_years'], data['agent_fee'], data['lawyer_fee'], data['mortgage_advisor_fee'], rules=rules)
+        data.update({
+            'stamp_duty': deal.stamp_duty,
+            'total_fees': deal.total_fees,
+            'total_cash': deal.total_cash,
+            'monthly_payment': deal.monthly_payment,
+        })
+        with st.sidebar.expander("Calculation timings"):
+            for step, seconds in deal.timings:
+                st.write(f"{step}: {seconds * 1e6:,.1f} µs")
         
         st.write("Here's a summary of your apartment deal and associated costs:")
-        st.write(f"• Apartment Price: {data['price']:,.0f} NIS")
-        st.write(f"• Mortgage Amount: {data['mortgage_amount']:,.0f} NIS")
-        st.write(f"• Purchase Tax: {data['stamp_duty']:,.0f} NIS")
-        st.write(f"• Agent Fee: {data['agent_fee']:,.0f} NIS")
-        st.write(f"• Lawyer Fee: {data['lawyer_fee']:,.0f} NIS")
-        st.write(f"• Mortgage Advisor Fee: {data['mortgage_advisor_fee']:,.0f} NIS")
-        
-        total_costs = data['stamp_duty'] + data['agent_fee'] + data['lawyer_fee'] + data['mortgage_advisor_fee']
-        total_investment = data['price'] - data['mortgage_amount'] + total_costs
-        
-        st.write(f"• Total Additional Costs: {total_costs:,.0f} NIS")
-        st.write(f"• Total Cash Investment (Price - Mortgage + Additional Costs): {total_investment:,.0f} NIS")
-        st.write(f"• Estimated Monthly Mortgage Payment ({data['mortgage_years']} years): {data['monthly_payment']:,.0f} NIS")
-        
+        st.write(f"• Apartment Price: {deal.price:,.0f} NIS")
+        st.write(f"• Mortgage Amount: {deal.mortgage_amount:,.0f} NIS")
+        st.write(f"• Purchase Tax: {deal.stamp_duty:,.0f} NIS")
+        st.write(f"• Agent Fee: {deal.agent_fee:,.0f} NIS")
+        st.write(f"• Lawyer Fee: {deal.lawyer_fee:,.0f} NIS")
+        st.write(f"• Mortgage Advisor Fee: {deal.mortgage_advisor_fee:,.0f} NIS")
+        st.write(f"• Total Additional Costs: {deal.total_fees:,.0f} NIS")
+        st.write(f"• Total Cash Investment (Price - Mortgage + Additional Costs): {deal.total_cash:,.0f} NIS")
+        st.write(f"• Estimated Monthly Mortgage Payment ({deal.mortgage_years} years): {deal.monthly_payment:,.0f} NIS")
+        
+        summary_data = known_summary_data(data)
+        if display_currencies:
+            summary_data = add_currency_columns(summary_data, display_currencies)
+            st.dataframe(pd.DataFrame(summary_data).style.format(precision=0, thousands=","), hide_index=True, use_container_width=True)
+
         download_summary = st.button("Download Summary as Excel")
         if download_summary:
-            summary_data = {
-                "Item": ["Apartment Price", "Mortgage Amount", "Purchase Tax", "Agent Fee", "Lawyer Fee", "Mortgage Advisor Fee", "Total Additional Costs", "Total Cash Investment", f"Estimated Monthly Mortgage Payment ({data['mortgage_years']} years)"],
-                "Amount (NIS)": [data['price'], data['mortgage_amount'], data['stamp_duty'], data['agent_fee'], data['lawyer_fee'], data['mortgage_advisor_fee'], total_costs, total_investment, data['monthly_payment']]
-            }
-            df_summary = pd.DataFrame(summary_data)
-            towrite = BytesIO()
-            df_summary.to_excel(towrite, index=False, sheet_name="Apartment Deal Summary")
-            towrite.seek(0)
+            # Use the file prepared in the background when the user kept the defaults (NIS only)
+            defaults = prefetched_defaults()
+            towrite = defaults['excel'].get(summary_key(data)) if defaults and not display_currencies else None
+            if towrite is None:
+                towrite = summary_excel_bytes(summary_data, "Apartment Deal Summary")
             st.download_button(label="Click to Download", data=towrite, file_name="apartment_deal_summary.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        
+
+        download_report = st.button("Download Printable Report")
+        if download_report:
+            report = render_report(data, KNOWN_FLOW, summary_data if display_currencies else None)
+            st.download_button(label="Click to Download Report", data=report, file_name="apartment_deal_report.html", mime="text/html")
+
+        share_link_button(data, KNOWN_FLOW)
+
+        if st.button("📈 Analyze as an Investment", use_container_width=True):
+            go("investment")
+        if st.button("🔄 Refinance or Prepay Later", use_container_width=True):
+            go("refinance")
+        if st.button("🏗️ Buying Off-Plan from a Contractor?", use_container_width=True):
+            go("new_build")
+
         # Navigation buttons
         col1, col2 = st.columns(2)
         with col1:
@@ -301,31 +453,240 @@ elif st.session_state.page == "known_summary":
                     del st.session_state.known_data
                 go("home")
 
+# --- INVESTMENT PAGE ---
+elif st.session_state.page == "investment":
+    st.title("📈 Investment Analysis")
+
+    if 'known_data' not in st.session_state or 'monthly_payment' not in st.session_state.known_data:
+        st.error("Please complete the known deal steps first.")
+        if st.button("⬅️ Go to Deal Basics", use_container_width=True):
+            go("known_basics")
+    else:
+        data = st.session_state.known_data
+
+        st.write("Let's see how this apartment performs as a rental investment.")
+
+        # Rent and appreciation ranges drive the sensitivity grid
+        col1, col2 = st.columns(2)
+        with col1:
+            rent_min, rent_max = st.slider("Monthly rent range (NIS)", min_value=1000, max_value=30000, value=(5000, 9000), step=500)
+            appreciation_min, appreciation_max = st.slider("Yearly appreciation range (%)", min_value=-5.0, max_value=10.0, value=(0.0, 5.0), step=0.5)
+            years = st.slider("Holding period (years)", min_value=10, max_value=30, value=20)
+        with col2:
+            vacancy_pct = st.number_input("Vacancy (%)", min_value=0.0, max_value=100.0, value=4.0, step=0.5)
+            maintenance_pct = st.number_input("Maintenance (% of rent)", min_value=0.0, max_value=100.0, value=5.0, step=0.5)
+            monthly_arnona = st.number_input("Arnona paid by you (NIS per month)", min_value=0, value=0)
+            rent_growth_pct = st.number_input("Yearly rent increase (%)", min_value=0.0, max_value=20.0, value=2.0, step=0.5)
+
+        tax_track_labels = {
+            "exempt": "Exempt track (up to the monthly ceiling)",
+            "ten_percent": "10% of gross rent",
+            "marginal": "Marginal rate on net rent",
+        }
+        tax_track = st.selectbox("Rental income tax track", options=list(tax_track_labels), format_func=tax_track_labels.get)
+        marginal_pct = st.number_input("Your marginal tax rate (%)", min_value=0.0, max_value=50.0, value=31.0, step=1.0)
+        discount_pct = st.number_input("Discount rate for NPV (%)", min_value=0.0, max_value=20.0, value=5.0, step=0.5)
+
+        monthly_rents = np.arange(rent_min, rent_max + 1, 500)
+        appreciation_rates = np.arange(appreciation_min, appreciation_max + 0.25, 0.5) / 100
+        projection = project_investment(
+            data, monthly_rents, appreciation_rates, years=years,
+            vacancy_rate=vacancy_pct / 100, monthly_arnona=monthly_arnona,
+            maintenance_rate=maintenance_pct / 100, rent_growth=rent_growth_pct / 100,
+            tax_track=tax_track, marginal_rate=marginal_pct / 100, discount_rate=discount_pct / 100,
+        )
+
+        # Base case: middle of both ranges
+        i, j = len(monthly_rents) // 2, len(appreciation_rates) // 2
+        st.success(f"**Base case: {monthly_rents[i]:,.0f} NIS rent, {appreciation_rates[j]*100:.1f}% appreciation**")
+        st.write(f"• Net rent in the first year (after expenses and tax): {projection['first_year_net_rent'][i, j]:,.0f} NIS")
+        st.write(f"• Estimated sale value after {years} years: {projection['sale_value'][i, j]:,.0f} NIS")
+        st.write(f"• IRR: {projection['irr'][i, j]*100:.2f}%")
+        st.write(f"• NPV at {discount_pct:.1f}%: {projection['npv'][i, j]:,.0f} NIS")
+
+        st.subheader("IRR Sensitivity (%)")
+        irr_table = pd.DataFrame(
+            projection['irr'] * 100,
+            index=[f"{rent:,.0f} NIS" for rent in monthly_rents],
+            columns=[f"{rate*100:.1f}%" for rate in appreciation_rates],
+        )
+        st.dataframe(irr_table.style.format("{:.2f}"), use_container_width=True)
+
+        # Navigation buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("⬅️ Back to Summary", use_container_width=True):
+                go("known_summary")
+        with col2:
+            if st.button("🏠 Back to Home", use_container_width=True):
+                go("home")
+
+# --- REFINANCE PAGE ---
+elif st.session_state.page == "refinance":
+    st.title("🔄 Refinance Calculator")
+
+    if 'known_data' not in st.session_state or 'monthly_payment' not in st.session_state.known_data:
+        st.error("Please complete the known deal steps first.")
+        if st.button("⬅️ Go to Deal Basics", use_container_width=True):
+            go("known_basics")
+    elif st.session_state.known_data['mortgage_amount'] <= 0:
+        st.info("This deal has no mortgage, so there is nothing to refinance.")
+        if st.button("⬅️ Back to Summary", use_container_width=True):
+            go("known_summary")
+    else:
+        data = st.session_state.known_data
+        months = data['mortgage_years'] * 12
+
+        st.write(f"Check whether refinancing your {data['mortgage_amount']:,.0f} NIS mortgage ({data['mortgage_years']} years) pays off later on.")
+
+        # The whole rate grid is compared in one vectorized pass
+        col1, col2 = st.columns(2)
+        with col1:
+            current_rate_pct = st.number_input("Current mortgage rate (%)", min_value=0.0, max_value=20.0, value=5.0, step=0.1)
+            months_paid = st.slider("Payments already made (months)", min_value=0, max_value=months - 1, value=min(60, months - 1))
+            rate_min, rate_max = st.slider("New rates to compare (%)", min_value=0.5, max_value=10.0, value=(2.5, 5.0), step=0.25)
+        with col2:
+            switching_costs = st.number_input("Costs of the new loan (advisor, appraisal, fees) (NIS)", min_value=0, value=5000, step=500)
+            cpi_change_pct = st.number_input("CPI gap for index-linked loans (%)", min_value=0.0, max_value=10.0, value=0.0, step=0.1, help="Leave at 0 for unlinked loans.")
+
+        new_rates = np.arange(rate_min, rate_max + 0.125, 0.25) / 100
+        grid = refinance_grid(data['mortgage_amount'], current_rate_pct / 100, months, months_paid, new_rates,
+                              switching_costs=switching_costs, cpi_change=cpi_change_pct / 100)
+
+        st.success(f"**Remaining balance after {months_paid} payments: {grid['remaining_balance']:,.0f} NIS**")
+        st.write(f"• Current monthly payment at {current_rate_pct:.2f}%: {grid['current_payment']:,.0f} NIS")
+
+        refinance_table = pd.DataFrame({
+            'New Payment': grid['new_payment'],
+            'Monthly Saving': grid['monthly_saving'],
+            'Early Repayment Fee': grid['capitalization_fee'] + grid['cpi_fee'],
+            'Total Cost': grid['total_cost'],
+            'Break-even Month': grid['break_even_month'],
+        }, index=pd.Index([f"{rate*100:.2f}%" for rate in new_rates], name="New rate"))
+        st.dataframe(refinance_table.style.format("{:,.0f}", na_rep="Never"), use_container_width=True)
+
+        worthwhile = ~np.isnan(grid['break_even_month'])
+        if worthwhile.any():
+            st.info(f"Refinancing pays off at rates up to {new_rates[worthwhile].max()*100:.2f}%.")
+        else:
+            st.warning("Refinancing does not pay off at any of these rates before the loan ends.")
+
+        # Navigation buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("⬅️ Back to Summary", use_container_width=True):
+                go("known_summary")
+        with col2:
+            if st.button("🏠 Back to Home", use_container_width=True):
+                go("home")
+
+# --- NEW BUILD PAGE ---
+elif st.session_state.page == "new_build":
+    st.title("🏗️ Off-Plan Payment Schedule")
+
+    if 'known_data' not in st.session_state or 'monthly_payment' not in st.session_state.known_data:
+        st.error("Please complete the known deal steps first.")
+        if st.button("⬅️ Go to Deal Basics", use_container_width=True):
+            go("known_basics")
+    else:
+        data = st.session_state.known_data
+
+        st.write("When buying from a contractor, you pay in stages linked to the construction input index. "
+                 "See how much cash you need each month across many index scenarios.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            construction_months = st.slider("Months until delivery", min_value=12, max_value=60, value=36, step=6)
+            plan_labels = {
+                "staged": "20% at signing, 4 x 15% during construction, 20% at delivery",
+                "20_80": "20% at signing, 80% at delivery",
+            }
+            plan_choice = st.selectbox("Payment plan", options=list(plan_labels), format_func=plan_labels.get)
+            linkage_pct = st.number_input("Share of the index increase you pay (%)", min_value=0.0, max_value=100.0, value=DEFAULT_LINKAGE_SHARE * 100, step=5.0)
+        with col2:
+            drift_pct = st.number_input("Expected yearly index increase (%)", min_value=-5.0, max_value=20.0, value=4.0, step=0.5)
+            volatility_pct = st.number_input("Index volatility (% per year)", min_value=0.0, max_value=20.0, value=3.0, step=0.5)
+            scenarios = st.select_slider("Scenarios", options=[500, 1000, 5000, 10000], value=1000)
+
+        if plan_choice == "staged":
+            payment_plan = [(0, 0.20)] + [(construction_months * k // 5, 0.15) for k in range(1, 5)] + [(construction_months, 0.20)]
+        else:
+            payment_plan = [(0, 0.20), (construction_months, 0.80)]
+
+        # Every scenario is simulated in one vectorized pass; a fixed seed keeps reruns stable
+        index_paths = simulate_index_paths(construction_months, scenarios, drift_pct / 100, volatility_pct / 100, seed=0)
+        plan = simulate_payment_plan(data['price'], payment_plan, index_paths, data['mortgage_amount'], data['mortgage_years'],
+                                     linkage_share=linkage_pct / 100)
+
+        total_price = cost_distribution(plan['total_price'])
+        total_cash = cost_distribution(plan['total_cash'])
+        st.success(f"**Median price including linkage: {total_price[50]:,.0f} NIS** (signed at {data['price']:,.0f} NIS)")
+        distribution_table = pd.DataFrame({
+            'Price Including Linkage': list(total_price.values()),
+            'Cash Paid Until Delivery': list(total_cash.values()),
+        }, index=pd.Index([f"{p}th" for p in total_price], name="Percentile"))
+        st.dataframe(distribution_table.style.format("{:,.0f}"), use_container_width=True)
+
+        st.write("**Cash needed per month (NIS)**")
+        st.line_chart(pd.DataFrame({
+            'Median': np.median(plan['cash_needed'], axis=0),
+            '95th percentile': np.percentile(plan['cash_needed'], 95, axis=0),
+        }, index=pd.Index(np.arange(construction_months + 1), name="Month")))
+
+        # Navigation buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("⬅️ Back to Summary", use_container_width=True):
+                go("known_summary")
+        with col2:
+            if st.button("🏠 Back to Home", use_container_width=True):
+                go("home")
+
 # --- UNKNOWN BASICS PAGE ---
 elif st.session_state.page == "unknown_basics":
     st.title("🤔 Help me decide - Budget Basics")
     st.write("Let's start with some basic information to help you find the right apartment deal.")
     
-    # The user will enter his available cash in NIS
-    total_cash = st.number_input("Enter your total available cash (NIS)", min_value=0, help="This is the total cash you have available (including money for fees and down payment)")
-    
-    # The user will enter whether he is an Israeli citizen or not
-    is_israeli = st.checkbox("I am an Israeli citizen")
-    
-    # The user will enter whether this is his first apartment or not
-    is_first_apartment = st.checkbox("This is my first apartment")
-    # The user will enter whether he is an Oleh Hadash or not
-    is_oleh = st.checkbox("I am an Oleh Hadash (new immigrant)")
+    with input_group("unknown_basics_form"):
+        # The user will enter his available cash in NIS
+        total_cash = st.number_input("Enter your total available cash (NIS)", min_value=0, help="This is the total cash you have available (including money for fees and down payment)")
+        
+        # The user will enter whether he is an Israeli citizen or not
+        is_israeli = st.checkbox("I am an Israeli citizen")
+        
+        # The user will enter whether this is his first apartment or not
+        is_first_apartment = st.checkbox("This is my first apartment")
+        # The user will enter whether he is an Oleh Hadash or not
+        is_oleh = st.checkbox("I am an Oleh Hadash (new immigrant)")
+
+        # We will calculate the maximum mortgage he can take based on the max monthly payment and the years
+        mortgage_years = st.selectbox("Select the mortgage term (years)", options=[20, 30], index=1)
+        submit_input_group("Calculate", "unknown_basics_form", [total_cash, is_israeli, is_first_apartment, is_oleh, mortgage_years])
 
-    # We will calculate the maximum mortgage he can take based on the max monthly payment and the years
-    mortgage_years = st.selectbox("Select the mortgage term (years)", options=[20, 30], index=1)
+    # Replacement home: Israelis selling their current apartment after buying the new one
+    window = rules.replacement_sale_window_months
+    is_replacing = is_israeli and not is_first_apartment and st.checkbox(
+        "I am replacing my current apartment (selling it after buying the new one)",
+        help=f"You pay {rules.non_first_home_tax_rate * 100:g}% purchase tax first. If you sell your current apartment within "
+             f"{window} months, the first-apartment brackets apply and the difference is refunded.",
+    )
+    bridge_loan = 0
+    if is_replacing:
+        with input_group("replacement_form"):
+            old_sale_price = st.number_input("Expected sale price of your current apartment (NIS)", min_value=0, step=50000)
+            old_mortgage_balance = st.number_input("Remaining mortgage on your current apartment (NIS)", min_value=0, step=10000)
+            bridge_loan = st.number_input("Bridge loan until the sale (NIS)", min_value=0, step=50000, help="Banks usually advance up to the equity in your current apartment until it is sold.")
+            bridge_rate = st.number_input("Bridge loan interest rate (%)", min_value=0.0, max_value=20.0, value=DEFAULT_BRIDGE_RATE * 100, step=0.1) / 100
+            submit_input_group("Update", "replacement_form", [old_sale_price, old_mortgage_balance, bridge_loan, bridge_rate])
+        if bridge_loan > 0:
+            st.info(f"With the bridge loan, {total_cash + bridge_loan:,.0f} NIS is available at purchase ({total_cash:,.0f} NIS of your cash + {bridge_loan:,.0f} NIS bridge loan).")
+    # The bridge loan is financing, not savings: it only adds to the cash available for the purchase
+    purchase_cash = total_cash + bridge_loan
     
-    if total_cash > 0:
+    if purchase_cash > 0:
         # Calculate maximum mortgage based on citizenship and first apartment status
-        if is_israeli and is_first_apartment:
-            max_ltv = 0.75  # 75% loan-to-value for Israeli first-time buyers
-        else:
-            max_ltv = 0.50  # 50% loan-to-value for others
+        # 75% loan-to-value for Israeli first-time buyers, 70% when replacing an apartment, 50% for others (by default)
+        max_ltv = rules.replacement_ltv if is_replacing else rules.max_ltv(is_israeli, is_first_apartment)
         
         # Estimate fees as percentage of price (rough estimate for initial calculation)
         # Typical fees: lawyer (1.18%), agent (1.77%), mortgage advisor (~1%), purchase tax (varies)
@@ -333,31 +694,37 @@ elif st.session_state.page == "unknown_basics":
         
         # Initial price estimate: Cash = Price * (1 - LTV + fee_rate)
         # So: Price = Cash / (1 - LTV + fee_rate)
-        initial_price_estimate = total_cash / (1 - max_ltv + estimated_fee_rate)
+        initial_price_estimate = purchase_cash / (1 - max_ltv + estimated_fee_rate)
         
         # Calculate maximum mortgage based on LTV ratio
         max_mortgage_from_ltv = initial_price_estimate * max_ltv
         
         st.success(f"Based on your profile, you can get a mortgage of up to {max_ltv*100:.0f}% of the apartment price.")
-        st.info(f"With your total cash of {total_cash:,.0f} NIS, the estimated maximum mortgage you can take is approximately {max_mortgage_from_ltv:,.0f} NIS.")
+        st.info(f"With {purchase_cash:,.0f} NIS available at purchase, the estimated maximum mortgage you can take is approximately {max_mortgage_from_ltv:,.0f} NIS.")
         
         # Let user choose mortgage amount
-        chosen_mortgage = st.slider(
-            "Choose your desired mortgage amount (NIS)", 
-            min_value=0, 
-            max_value=int(max_mortgage_from_ltv), 
-            value=int(max_mortgage_from_ltv * 0.8),  # Default to 80% of max
-            step=50000,
-            help="Select how much you want to borrow. Lower amounts mean lower monthly payments."
-        )
+        with input_group("unknown_mortgage_form"):
+            chosen_mortgage = st.slider(
+                "Choose your desired mortgage amount (NIS)", 
+                min_value=0, 
+                max_value=int(max_mortgage_from_ltv), 
+                value=int(max_mortgage_from_ltv * 0.8),  # Default to 80% of max
+                step=50000,
+                help="Select how much you want to borrow. Lower amounts mean lower monthly payments."
+            )
+            submit_input_group("Update mortgage", "unknown_mortgage_form", [chosen_mortgage])
+
+        # Optional: screen the mortgage against the bank lending limits, which also depend on income and age
+        with input_group("bank_check_form"):
+            st.write("**Bank approval check (optional)**")
+            net_monthly_income = st.number_input("Household net monthly income (NIS)", min_value=0, step=1000)
+            borrower_age = st.number_input("Age of the oldest borrower", min_value=0, max_value=100, help="Leave at 0 to skip the bank approval check.")
+            submit_input_group("Check", "bank_check_form", [net_monthly_income, borrower_age])
         
         if chosen_mortgage >= 0:  # Allow zero mortgage (cash purchase)
             # Calculate monthly payment based on chosen mortgage
             if chosen_mortgage > 0:
-                if mortgage_years == 30:
-                    monthly_payment = (chosen_mortgage / 1000000) * 5550
-                else:
-                    monthly_payment = (chosen_mortgage / 1000000) * 6700
+                monthly_payment = estimate_monthly_payment(chosen_mortgage, mortgage_years, rules)
                 st.write(f"**Your estimated monthly mortgage payment: {monthly_payment:,.0f} NIS** ({mortgage_years} years)")
             else:
                 monthly_payment = 0
@@ -367,32 +734,21 @@ elif st.session_state.page == "unknown_basics":
             # Iterative calculation: Cash = Fees + Down Payment, Price = Down Payment + Mortgage
             
             # Initial estimate: assume Price = Cash + Mortgage (ignoring fees for first iteration)
-            price_estimate = total_cash + chosen_mortgage
+            price_estimate = purchase_cash + chosen_mortgage
             
             # Iterate to find correct price
             for iteration in range(15):  # Max 15 iterations
-                # Calculate mortgage advisor fee
-                if chosen_mortgage == 0:
-                    mortgage_advisor_fee = 0
-                else:
-                    mortgage_advisor_fee = max(7500, chosen_mortgage * 0.01) * 1.18
-                
-                # Calculate purchase tax for current price estimate
-                if is_oleh and is_first_apartment:
-                    stamp_duty = calc_purchase_tax_oleh(price_estimate)
-                else:
-                    _, stamp_duty = calculate_mort_and_tax(price_estimate, is_israeli, is_first_apartment, chosen_mortgage)
-                
-                # Calculate total fees
-                lawyer_fee = price_estimate * 0.01 * 1.18
-                agent_fee = price_estimate * 0.015 * 1.18
-                total_fees = lawyer_fee + agent_fee + mortgage_advisor_fee + stamp_duty
+                # Fees and purchase tax for the current price estimate (same pipeline as the known flow)
+                deal = compute_deal(price_estimate, chosen_mortgage, is_israeli, is_first_apartment, is_oleh, mortgage_years, rules=rules)
+                lawyer_fee, agent_fee = deal.lawyer_fee, deal.agent_fee
+                mortgage_advisor_fee, stamp_duty = deal.mortgage_advisor_fee, deal.stamp_duty
+                total_fees = deal.total_fees
                 
                 # The correct equation: Total Cash = Total Fees + Down Payment
                 # Where: Down Payment = Price - Mortgage
                 # So: Total Cash = Total Fees + (Price - Mortgage)
                 # Therefore: Price = Total Cash - Total Fees + Mortgage
-                new_price = total_cash - total_fees + chosen_mortgage
+                new_price = purchase_cash - total_fees + chosen_mortgage
                 
                 # Check convergence
                 if abs(new_price - price_estimate) < 100:  # Converged within 100 NIS
@@ -404,7 +760,8 @@ elif st.session_state.page == "unknown_basics":
             down_payment = price - chosen_mortgage
             
             # Verify that we have enough cash and don't exceed LTV limits
-            if total_fees + down_payment > total_cash:
+            # The price converged to within 100 NIS, so allow a shortfall that small
+            if total_fees + down_payment > purchase_cash + 100:
                 st.error("❌ Insufficient cash! Please reduce the mortgage amount or increase your available cash.")
             elif chosen_mortgage > 0 and (chosen_mortgage / price) > max_ltv:
                 st.error(f"❌ Your chosen mortgage exceeds the maximum allowed ({max_ltv*100:.0f}% of apartment price). Please reduce the mortgage amount.")
@@ -427,23 +784,68 @@ elif st.session_state.page == "unknown_basics":
                     'mortgage_advisor_fee': mortgage_advisor_fee,
                     'stamp_duty': stamp_duty,
                     'total_fees': total_fees,
-                    'max_ltv': max_ltv
+                    'max_ltv': max_ltv,
+                    'is_replacing': is_replacing,
+                    'bridge_loan': bridge_loan,
                 }
+                log_calculation("unknown_basics", total_cash=total_cash, price=price, mortgage_amount=chosen_mortgage,
+                                is_israeli=is_israeli, is_first_apartment=is_first_apartment, is_oleh=is_oleh,
+                                mortgage_years=mortgage_years, stamp_duty=stamp_duty, total_fees=total_fees)
 
                 st.success(f"✅ **Summary:**")
                 st.write(f"• Maximum apartment price you can afford: **{price:,.0f} NIS**")
                 st.write(f"• Down payment (to seller): **{down_payment:,.0f} NIS**")
                 st.write(f"• Total fees: **{total_fees:,.0f} NIS**")
                 st.write(f"• Your chosen mortgage: **{chosen_mortgage:,.0f} NIS**")
+                if bridge_loan > 0:
+                    st.write(f"• Bridge loan (repaid from the sale): **{bridge_loan:,.0f} NIS**")
                 if chosen_mortgage > 0:
                     st.write(f"• Monthly mortgage payment: **{monthly_payment:,.0f} NIS**")
                     st.write(f"• Loan-to-value ratio: **{(chosen_mortgage/price)*100:.1f}%**")
+
+                if chosen_mortgage > 0 and net_monthly_income > 0 and borrower_age > 0:
+                    eligibility = check_eligibility(net_monthly_income, borrower_age, chosen_mortgage, price, mortgage_years, is_israeli,
+                                                    is_first_apartment, monthly_payment=monthly_payment, max_ltv=max_ltv)
+                    binding = str(eligibility['binding'])
+                    utilization = float(eligibility[f"{binding}_utilization"])
+                    if eligibility['passes']:
+                        st.info(f"🏦 The mortgage is within the bank lending limits. The closest limit is {CONSTRAINT_LABELS[binding]} ({utilization:.0%} used).")
+                    else:
+                        st.error(f"🏦 A bank is unlikely to approve this mortgage: it exceeds {CONSTRAINT_LABELS[binding]} ({utilization:.0%} of the limit). Please adjust the mortgage amount or term.")
                 
                 # Cash breakdown
-                st.info(f"💰 **Cash Usage:** {total_fees:,.0f} NIS (fees) + {down_payment:,.0f} NIS (down payment) = {total_fees + down_payment:,.0f} NIS of your {total_cash:,.0f} NIS")
-                remaining_cash = total_cash - total_fees - down_payment
+                st.info(f"💰 **Cash Usage:** {total_fees:,.0f} NIS (fees) + {down_payment:,.0f} NIS (down payment) = {total_fees + down_payment:,.0f} NIS of your {total_cash:,.0f} NIS" + (f" + {bridge_loan:,.0f} NIS bridge loan" if bridge_loan > 0 else ""))
+                remaining_cash = purchase_cash - total_fees - down_payment
                 if remaining_cash > 0:
                     st.success(f"💰 **Remaining cash:** {remaining_cash:,.0f} NIS")
+
+                if is_replacing and old_sale_price > 0:
+                    # Every combination of sale month and sale price in one vectorized pass
+                    sale_months = np.arange(1, 2 * window + 1)
+                    sale_prices = old_sale_price * np.array([0.9, 0.95, 1.0, 1.05, 1.1])
+                    replacement = simulate_replacement(price, sale_months, sale_prices, old_mortgage_balance, bridge_loan, bridge_rate, rules=rules)
+
+                    st.subheader("🔁 Selling Your Current Apartment")
+                    st.write(f"The purchase tax above is the interim {rules.non_first_home_tax_rate * 100:g}% rate. "
+                             f"Selling within {window} months refunds **{replacement['refund'][0, 0]:,.0f} NIS**.")
+                    expected = sale_prices.size // 2
+                    timing_table = pd.DataFrame({
+                        'Refund': replacement['refund'][:, expected],
+                        'Final Purchase Tax': replacement['final_tax'][:, expected],
+                        'Bridge Interest': replacement['bridge_interest'][:, expected],
+                        'Total Cost': replacement['total_cost'][:, expected],
+                        'Cash After Sale': replacement['cash_at_sale'][:, expected],
+                        'Cash After Refund': replacement['cash_after_refund'][:, expected],
+                    }, index=pd.Index(sale_months, name="Sale month"))
+                    st.dataframe(timing_table.style.format("{:,.0f}"), use_container_width=True)
+
+                    st.write("**Cash after the sale and refund, by sale month and sale price (NIS)**")
+                    cash_grid = pd.DataFrame(
+                        replacement['cash_after_refund'],
+                        index=pd.Index(sale_months, name="Sale month"),
+                        columns=[f"{p:,.0f}" for p in sale_prices],
+                    )
+                    st.dataframe(cash_grid.style.format("{:,.0f}"), use_container_width=True)
         
     else:
         st.warning("Please enter your total available cash to see calculations.") 
@@ -479,8 +881,9 @@ elif st.session_state.page == "unknown_details":
         else:
             st.write("• **Cash purchase - No monthly mortgage payments**")
         
-        # Calculate remaining cash after purchase
-        remaining_cash = data['total_cash'] - data['total_fees'] - data['down_payment']
+        # Calculate remaining cash after purchase (the bridge loan is spent on the purchase too)
+        bridge_loan = data.get('bridge_loan', 0)
+        remaining_cash = data['total_cash'] + bridge_loan - data['total_fees'] - data['down_payment']
         
         # Show breakdown of all costs
         st.subheader("💰 Complete Cost Breakdown:")
@@ -501,6 +904,8 @@ elif st.session_state.page == "unknown_details":
             st.write(f"• Total cash available: {data['total_cash']:,.0f} NIS")
             st.write(f"• Down payment: {data['down_payment']:,.0f} NIS")
             st.write(f"• Mortgage amount: {data['chosen_mortgage']:,.0f} NIS")
+            if bridge_loan > 0:
+                st.write(f"• Bridge loan (repaid from the sale): {bridge_loan:,.0f} NIS")
             if data['chosen_mortgage'] > 0:
                 st.write(f"• Monthly payment: {data['monthly_payment']:,.0f} NIS")
             
@@ -510,54 +915,60 @@ elif st.session_state.page == "unknown_details":
         
         st.write("---")
         st.write(f"**Total transaction fees: {data['total_fees']:,.0f} NIS**")
+
+        if display_currencies:
+            st.dataframe(pd.DataFrame(add_currency_columns(unknown_summary_data(data), display_currencies)).style.format(precision=0, thousands=","), hide_index=True, use_container_width=True)
         
         # Verify the equation
         cash_used = data['total_fees'] + data['down_payment']
-        st.write(f"**Cash Verification:** Fees ({data['total_fees']:,.0f}) + Down Payment ({data['down_payment']:,.0f}) = {cash_used:,.0f} NIS used from your {data['total_cash']:,.0f} NIS")
+        st.write(f"**Cash Verification:** Fees ({data['total_fees']:,.0f}) + Down Payment ({data['down_payment']:,.0f}) = {cash_used:,.0f} NIS used from your {data['total_cash']:,.0f} NIS" + (f" + {bridge_loan:,.0f} NIS bridge loan" if bridge_loan > 0 else ""))
         st.write(f"**Price Verification:** Down Payment ({data['down_payment']:,.0f}) + Mortgage ({data['chosen_mortgage']:,.0f}) = {data['down_payment'] + data['chosen_mortgage']:,.0f} NIS")
         st.write(f"This should equal apartment price: {data['price']:,.0f} NIS ✓" if abs((data['down_payment'] + data['chosen_mortgage']) - data['price']) < 100 else "⚠️ Calculation mismatch")
+
+        # Matching apartments, when a listings file is available
+        if os.path.exists(LISTINGS_PATH):
+            st.subheader("🏘️ Apartments Within Your Budget")
+            listing_index = load_listing_index()
+            col1, col2 = st.columns(2)
+            with col1:
+                city = st.selectbox("City", options=["All cities"] + listing_index.cities)
+            with col2:
+                min_rooms = st.number_input("Minimum rooms", min_value=0.0, max_value=10.0, value=0.0, step=0.5)
+            matches = listing_index.affordable(
+                data['total_cash'] + bridge_loan, data['chosen_mortgage'], data['is_israeli'], data['is_first_apartment'], data['is_oleh'],
+                data['price'], city=None if city == "All cities" else city, min_rooms=min_rooms or None, limit=50,
+                max_ltv=data['max_ltv'],
+            )
+            if matches.empty:
+                st.info("No listings match your budget and filters.")
+            else:
+                st.dataframe(matches, hide_index=True, use_container_width=True)
         
         # Download summary button
         download_summary = st.button("📄 Download Summary as Excel", use_container_width=True)
         if download_summary:
-            summary_data = {
-                "Item": [
-                    "Apartment Price", 
-                    "Total Cash Available",
-                    "Down Payment", 
-                    "Mortgage Amount", 
-                    "Purchase Tax", 
-                    "Agent Fee", 
-                    "Lawyer Fee", 
-                    "Mortgage Advisor Fee", 
-                    "Total Transaction Fees", 
-                    "Remaining Cash After Purchase",
-                    f"Monthly Mortgage Payment ({data['mortgage_years']} years)" if data['chosen_mortgage'] > 0 else "Monthly Payment (Cash Purchase)"
-                ],
-                "Amount (NIS)": [
-                    data['price'], 
-                    data['total_cash'],
-                    data['down_payment'], 
-                    data['chosen_mortgage'], 
-                    data['stamp_duty'], 
-                    data['agent_fee'], 
-                    data['lawyer_fee'], 
-                    data['mortgage_advisor_fee'], 
-                    data['total_fees'], 
-                    remaining_cash, 
-                    data['monthly_payment'] if data['chosen_mortgage'] > 0 else 0
-                ]
-            }
-            df_summary = pd.DataFrame(summary_data)
-            towrite = BytesIO()
-            df_summary.to_excel(towrite, index=False, sheet_name="Apartment Budget Analysis")
-            towrite.seek(0)
+            summary_data = unknown_summary_data(data)
+            if display_currencies:
+                summary_data = add_currency_columns(summary_data, display_currencies)
+            towrite = summary_excel_bytes(summary_data, "Apartment Budget Analysis")
             st.download_button(
                 label="Click to Download Excel File", 
                 data=towrite, 
                 file_name="apartment_budget_analysis.xlsx", 
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+
+        download_report = st.button("🖨️ Download Printable Report", use_container_width=True)
+        if download_report:
+            currency_columns = add_currency_columns(unknown_summary_data(data), display_currencies) if display_currencies else None
+            st.download_button(
+                label="Click to Download Report",
+                data=render_report(data, UNKNOWN_FLOW, currency_columns),
+                file_name="apartment_budget_report.html",
+                mime="text/html"
+            )
+
+        share_link_button(data, UNKNOWN_FLOW)
         
         # Navigation buttons
         col1, col2 = st.columns(2)
@@ -569,4 +980,7 @@ elif st.session_state.page == "unknown_details":
                 # Clear session state and go home
                 if 'unknown_data' in st.session_state:
                     del st.session_state.unknown_data
-                go("home")
\ No newline at end of file
+                go("home")
+
+# Rendered last so it includes the reruns counted on this run
+st.sidebar.metric("Reruns avoided", st.session_state.get("reruns_avoided", 0))
@@ -0,0 +1,129 @@
+import argparse
+import os
+
+import numpy as np
+
+from utils.batch_calculations import max_affordable_batch, monthly_payment_batch
+from utils.rules import current_rules, on_rules_change
+
+# Buyer profiles as (is_israeli, is_first_apartment, is_oleh)
+PROFILES = {
+    "israeli_first_home": (True, True, False),
+    "oleh": (True, True, True),
+    "other": (False, False, False),
+}
+TERMS = (20, 30)
+FIELDS = ("total_cash", "price", "max_mortgage", "monthly_payment", "total_fees")
+
+_loaded_cubes = {}
+# Cubes loaded under the old rules are stale after a reload; the next load re-checks the fingerprint
+on_rules_change(_loaded_cubes.clear)
+
+
+def _rules_path(path):
+    # Fingerprint of the rules a cube was built with, stored next to the .npy file
+    return path + ".rules"
+
+
+def build_affordability_cube(path, cash_min=100_000, cash_max=10_000_000, cash_step=10_000, chunk_size=100_000):
+    """
+    Precompute the maximum affordable price for a grid of cash x profile x term and save it as a .npy file.
+
+    Every cell is the unknown_basics result at the largest valid mortgage (max_affordable_batch).
+    The cube has shape (len(FIELDS), len(PROFILES), len(TERMS), n_cash) and is written through a
+    memory-mapped file chunk by chunk, so large grids never need to fit in memory twice. The active
+    rules' fingerprint is saved to `<path>.rules`.
+
+    Parameters:
+    - path (str): Output .npy file.
+    - cash_min, cash_max, cash_step (int): The cash axis in NIS (inclusive).
+    - chunk_size (int): Number of cash values solved per vectorized batch.
+
+    Returns:
+    - cube (np.memmap): The written cube.
+    """
+    rules = current_rules()
+    cash_axis = np.arange(cash_min, cash_max + cash_step, cash_step, dtype=float)
+    cube = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.float64, shape=(len(FIELDS), len(PROFILES), len(TERMS), cash_axis.size)
+    )
+
+    for p, (is_israeli, is_first_apartment, is_oleh) in enumerate(PROFILES.values()):
+        for start in range(0, cash_axis.size, chunk_size):
+            cash = cash_axis[start:start + chunk_size]
+            mortgage, result = max_affordable_batch(cash, is_israeli, is_first_apartment, is_oleh, rules=rules)
+            for t, years in enumerate(TERMS):
+                cube[0, p, t, start:start + chunk_size] = cash
+                cube[1, p, t, start:start + chunk_size] = result['price']
+                cube[2, p, t, start:start + chunk_size] = mortgage
+                cube[3, p, t, start:start + chunk_size] = monthly_payment_batch(mortgage, years, rules)
+                cube[4, p, t, start:start + chunk_size] = result['total_fees']
+
+    cube.flush()
+    with open(_rules_path(path), "w") as f:
+        f.write(rules.fingerprint())
+    _loaded_cubes.pop(path, None)
+    return cube
+
+
+def load_affordability_cube(path):
+    """
+    Open a cube written by build_affordability_cube without reading it into memory, cached per path
+    until the rules change.
+
+    Raises:
+    - ValueError: If the cube was built with rules other than the active ones.
+    """
+    if path not in _loaded_cubes:
+        fingerprint = None
+        if os.path.exists(_rules_path(path)):
+            with open(_rules_path(path)) as f:
+                fingerprint = f.read().strip()
+        if fingerprint != current_rules().fingerprint():
+            raise ValueError(f"{path} was built with different rules; rebuild it with build_affordability_cube")
+        _loaded_cubes[path] = np.load(path, mmap_mode="r")
+    return _loaded_cubes[path]
+
+
+def lookup_affordability(cube, total_cash, profile, mortgage_years):
+    """
+    Answer "what can I afford" by linear interpolation along the cash axis of the cube.
+
+    Cash outside the cube's range is solved exactly with max_affordable_batch under the active rules
+    instead of being clamped to the nearest edge.
+
+    Parameters:
+    - cube (np.ndarray): A cube from build_affordability_cube / load_affordability_cube.
+    - total_cash (float or array-like): Available cash in NIS.
+    - profile (str): One of PROFILES.
+    - mortgage_years (int): One of TERMS.
+
+    Returns:
+    - result (dict): Values keyed by FIELDS.
+    """
+    p = list(PROFILES).index(profile)
+    t = TERMS.index(mortgage_years)
+    cash_axis = cube[0, p, t]
+    total_cash = np.asarray(total_cash, dtype=float)
+    result = {field: np.array(np.interp(total_cash, cash_axis, cube[i, p, t])) for i, field in enumerate(FIELDS)}
+
+    outside = (total_cash < cash_axis[0]) | (total_cash > cash_axis[-1])
+    if outside.any():
+        rules = current_rules()
+        cash = total_cash[outside]
+        mortgage, solved = max_affordable_batch(cash, *PROFILES[profile], rules=rules)
+        exact = (cash, solved['price'], mortgage, monthly_payment_batch(mortgage, mortgage_years, rules), solved['total_fees'])
+        for field, values in zip(FIELDS, exact):
+            result[field][outside] = values
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the affordability cube used by reports and APIs.")
+    parser.add_argument("path", help="Output .npy file")
+    parser.add_argument("--cash-min", type=int, default=100_000)
+    parser.add_argument("--cash-max", type=int, default=10_000_000)
+    parser.add_argument("--cash-step", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+    build_affordability_cube(args.path, args.cash_min, args.cash_max, args.cash_step, args.chunk_size)
@@ -0,0 +1,161 @@
+import numpy as np
+
+from utils.rules import current_rules
+
+# Integer-agorot computation mode.
+#
+# Amounts are int64 agorot (1 NIS = 100 agorot) and rates are int64 parts-per-million, so every step
+# is an exact integer product followed by one documented rounding:
+#   1. NIS inputs are converted to agorot rounding half up on their decimal value.
+#   2. A percentage fee (price x rate) is rounded half up to the agora.
+#   3. VAT is applied to the rounded fee and rounded half up to the agora.
+#   4. Purchase tax sums every bracket's exact product and rounds half up once at the end.
+# Int64 keeps all intermediate products exact for prices up to roughly 90 billion NIS.
+
+AGOROT_PER_NIS = 100
+PPM = 1_000_000
+# Decimal places kept when scaling NIS to agorot, enough to drop float noise but no real digits
+AGOROT_SCALE_DECIMALS = 6
+
+
+def rate_to_ppm(rate):
+    """
+    Convert a fractional rate (e.g. 0.015) to integer parts-per-million (15,000).
+    """
+    return int(round(rate * PPM))
+
+
+
+def _div_round_half_up(numerator, denominator):
+    """
+    Integer division of non-negative int64 arrays, rounding half up.
+    """
+    return (numerator + denominator // 2) // denominator
+
+
+def to_agorot(nis):
+    """
+    Convert non-negative NIS amounts to int64 agorot, rounding the decimal value half up (1.005 NIS is 101 agorot).
+    """
+    # 1.005 * 100 is 100.49999999999999 in binary; rounding to a few decimals first restores 100.5
+    scaled = np.round(np.asarray(nis, dtype=float) * AGOROT_PER_NIS, AGOROT_SCALE_DECIMALS)
+    return np.floor(scaled + 0.5).astype(np.int64)
+
+
+def to_nis(agorot):
+    """
+    Convert int64 agorot back to float NIS for display.
+    """
+    return np.asarray(agorot, dtype=np.int64) / AGOROT_PER_NIS
+
+
+def apply_rate_agorot(amounts, rate_ppm):
+    """
+    amount x rate, rounded half up to the agora (step 2).
+    """
+    return _div_round_half_up(np.asarray(amounts, dtype=np.int64) * np.asarray(rate_ppm, dtype=np.int64), PPM)
+
+
+def add_vat_agorot(amounts, vat_ppm):
+    """
+    Add VAT (vat_ppm is the rules' VAT multiplier in ppm) to a fee already rounded to the agora,
+    rounding half up (step 3).
+    """
+    return apply_rate_agorot(amounts, vat_ppm)
+
+
+def bracket_tax_agorot(prices, brackets):
+    """
+    Progressive tax in agorot, rounded half up once after summing all brackets (step 4).
+
+    Parameters:
+    - prices (array-like of int): Deal prices in agorot.
+    - brackets (sequence): (lower, upper, rate) tuples in NIS, as in batch_calculations.
+    """
+    prices = np.asarray(prices, dtype=np.int64)
+    numerator = np.zeros_like(prices)
+    for lower, upper, rate in brackets:
+        lower_ag = int(lower) * AGOROT_PER_NIS
+        capped = prices if upper == float("inf") else np.minimum(prices, int(upper) * AGOROT_PER_NIS)
+        numerator += np.clip(capped - lower_ag, 0, None) * rate_to_ppm(rate)
+    return _div_round_half_up(numerator, PPM)
+
+
+def purchase_tax_agorot(prices, is_israeli, is_first_apartment, is_oleh, rules=None):
+    """
+    Integer-agorot equivalent of purchase_tax_batch.
+    """
+    rules = rules or current_rules()
+    prices = np.asarray(prices, dtype=np.int64)
+    first_home = np.logical_and(is_israeli, is_first_apartment)
+    oleh_first_home = np.logical_and(is_oleh, is_first_apartment)
+    flat = apply_rate_agorot(prices, rate_to_ppm(rules.non_first_home_tax_rate))
+    tax = np.where(first_home, bracket_tax_agorot(prices, rules.first_home.brackets), flat)
+    return np.where(oleh_first_home, bracket_tax_agorot(prices, rules.oleh.brackets), tax)
+
+
+def default_fees_agorot(prices, mortgage_amounts, rules=None):
+    """
+    Default agent, lawyer and mortgage advisor fees including VAT, in agorot.
+
+    Parameters:
+    - prices (array-like of int): Deal prices in agorot.
+    - mortgage_amounts (array-like of int): Mortgage amounts in agorot.
+
+    Returns:
+    - agent_fee, lawyer_fee, mortgage_advisor_fee (np.ndarray): int64 agorot.
+    """
+    rules = rules or current_rules()
+    vat_ppm = rate_to_ppm(rules.vat)
+    min_advisor_fee = int(round(rules.min_advisor_fee * AGOROT_PER_NIS))
+    mortgage_amounts = np.asarray(mortgage_amounts, dtype=np.int64)
+    agent_fee = add_vat_agorot(apply_rate_agorot(prices, rate_to_ppm(rules.agent_fee_rate)), vat_ppm)
+    lawyer_fee = add_vat_agorot(apply_rate_agorot(prices, rate_to_ppm(rules.lawyer_fee_rate)), vat_ppm)
+    advisor_base = np.maximum(min_advisor_fee, apply_rate_agorot(mortgage_amounts, rate_to_ppm(rules.advisor_fee_rate)))
+    mortgage_advisor_fee = np.where(mortgage_amounts == 0, 0, add_vat_agorot(advisor_base, vat_ppm))
+    return agent_fee, lawyer_fee, mortgage_advisor_fee
+
+
+def _fee_or_default(fee, default):
+    # A known fee in NIS replaces the default; NaN rows keep the default
+    if fee is None:
+        return default
+    fee = np.asarray(fee, dtype=float)
+    return np.where(np.isnan(fee), default, to_agorot(np.nan_to_num(fee)))
+
+
+def known_deal_costs_agorot(prices, mortgage_amounts, is_israeli, is_first_apartment, is_oleh,
+                            agent_fee=None, lawyer_fee=None, mortgage_advisor_fee=None):
+    """
+    The known_summary totals for many deals at once, exact to the agora.
+
+    Parameters:
+    - prices (array-like): Deal prices in NIS.
+    - mortgage_amounts (array-like): Mortgage amounts in NIS.
+    - is_israeli, is_first_apartment, is_oleh (bool or array-like of bool): Buyer profile flags.
+    - agent_fee, lawyer_fee, mortgage_advisor_fee (array-like or None): Fees the user already knows,
+      in NIS including VAT, as entered on known_expenses. None, or NaN in a row, means the default fee.
+
+    Returns:
+    - costs (dict): int64 agorot arrays keyed like st.session_state.known_data plus
+      'total_costs' and 'total_investment'.
+    """
+    rules = current_rules()
+    prices = to_agorot(prices)
+    mortgage_amounts = to_agorot(mortgage_amounts)
+    stamp_duty = purchase_tax_agorot(prices, is_israeli, is_first_apartment, is_oleh, rules)
+    default_agent, default_lawyer, default_advisor = default_fees_agorot(prices, mortgage_amounts, rules)
+    agent_fee = _fee_or_default(agent_fee, default_agent)
+    lawyer_fee = _fee_or_default(lawyer_fee, default_lawyer)
+    mortgage_advisor_fee = _fee_or_default(mortgage_advisor_fee, default_advisor)
+    total_costs = stamp_duty + agent_fee + lawyer_fee + mortgage_advisor_fee
+    return {
+        'price': prices,
+        'mortgage_amount': mortgage_amounts,
+        'stamp_duty': stamp_duty,
+        'agent_fee': agent_fee,
+        'lawyer_fee': lawyer_fee,
+        'mortgage_advisor_fee': mortgage_advisor_fee,
+        'total_costs': total_costs,
+        'total_investment': prices - mortgage_amounts + total_costs,
+    }
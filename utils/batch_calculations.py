@@ -0,0 +1,214 @@
+import numpy as np
+
+from utils.rules import DEFAULT_RULES, current_rules
+
+# The functions below read the active rules (utils.rules), which data/rules.json can change at runtime.
+# The built-in brackets are kept for comparisons with the scalar reference in utils.differential_check.
+
+# Purchase tax brackets as (lower, upper, rate), see calculate_mort_and_tax
+FIRST_HOME_BRACKETS = DEFAULT_RULES.first_home.brackets
+# See calc_purchase_tax_oleh
+OLEH_BRACKETS = DEFAULT_RULES.oleh.brackets
+
+
+def bracket_tax(prices, brackets):
+    """
+    Progressive tax for a whole array of prices at once.
+
+    Parameters:
+    - prices (array-like): Deal prices in NIS.
+    - brackets (sequence): (lower, upper, rate) tuples, in ascending order.
+
+    Returns:
+    - tax (np.ndarray): The tax for every price, in NIS.
+    """
+    prices = np.asarray(prices, dtype=float)
+    tax = np.zeros_like(prices)
+    for lower, upper, rate in brackets:
+        tax += np.clip(np.minimum(prices, upper) - lower, 0, None) * rate
+    return tax
+
+
+def max_ltv_batch(is_israeli, is_first_apartment, rules=None):
+    """
+    Maximum loan-to-value ratio: 75% for Israelis buying their first apartment, 50% for everyone else.
+    """
+    rules = rules or current_rules()
+    first_home = np.logical_and(is_israeli, is_first_apartment)
+    return np.where(first_home, rules.first_home_ltv, rules.other_ltv)
+
+
+def purchase_tax_batch(prices, is_israeli, is_first_apartment, is_oleh, rules=None):
+    """
+    Vectorized equivalent of calculate_mort_and_tax's stamp duty with the Oleh override used in app.py.
+
+    Parameters:
+    - prices (array-like): Deal prices in NIS.
+    - is_israeli, is_first_apartment, is_oleh (bool or array-like of bool): Buyer profile flags,
+      broadcast against prices.
+    - rules (Rules or None): The rules to apply; the active rules when None.
+
+    Returns:
+    - stamp_duty (np.ndarray): Purchase tax in NIS.
+    """
+    rules = rules or current_rules()
+    prices = np.asarray(prices, dtype=float)
+    first_home = np.logical_and(is_israeli, is_first_apartment)
+    oleh_first_home = np.logical_and(is_oleh, is_first_apartment)
+    tax = np.where(first_home, rules.first_home.tax_batch(prices), prices * rules.non_first_home_tax_rate)
+    return np.where(oleh_first_home, rules.oleh.tax_batch(prices), tax)
+
+
+def default_advisor_fee_batch(mortgage_amounts, rules=None):
+    """
+    Default mortgage advisor fee: max(7500, 1% of the mortgage) + VAT, and zero when no mortgage is taken.
+    """
+    rules = rules or current_rules()
+    mortgage_amounts = np.asarray(mortgage_amounts, dtype=float)
+    fee = np.maximum(rules.min_advisor_fee, mortgage_amounts * rules.advisor_fee_rate) * rules.vat
+    return np.where(mortgage_amounts == 0, 0.0, fee)
+
+
+def monthly_payment_batch(mortgage_amounts, mortgage_years, rules=None):
+    """
+    Estimated monthly payment, using the same per-million factors as the mortgage pages.
+
+    Raises:
+    - ValueError: If any term has no payment factor, like estimate_monthly_payment.
+    """
+    payment_per_million = (rules or current_rules()).payment_per_million
+    mortgage_amounts = np.asarray(mortgage_amounts, dtype=float)
+    mortgage_years = np.asarray(mortgage_years)
+    terms = sorted(payment_per_million)
+    unsupported = ~np.isin(mortgage_years, terms)
+    if unsupported.any():
+        raise ValueError(f"Unsupported mortgage term: {mortgage_years[unsupported].flat[0]} years (supported: {terms})")
+    factor = np.array([payment_per_million[years] for years in terms])[np.searchsorted(terms, mortgage_years)]
+    return (mortgage_amounts / 1000000) * factor
+
+
+def default_mortgage_batch(total_cash, max_ltv, estimated_fee_rate=0.05):
+    """
+    The mortgage pre-selected on the unknown_basics slider: 80% of the LTV-based maximum.
+
+    Returns:
+    - max_mortgage_from_ltv (np.ndarray): The estimated maximum mortgage in NIS.
+    - default_mortgage (np.ndarray): The default slider value in whole NIS.
+    """
+    total_cash = np.asarray(total_cash, dtype=float)
+    initial_price_estimate = total_cash / (1 - max_ltv + estimated_fee_rate)
+    max_mortgage_from_ltv = initial_price_estimate * max_ltv
+    default_mortgage = np.floor(np.floor(max_mortgage_from_ltv) * 0.8)
+    return max_mortgage_from_ltv, default_mortgage
+
+
+def affordable_price_batch(total_cash, chosen_mortgage, is_israeli, is_first_apartment, is_oleh,
+                           max_iterations=15, tolerance=100, rules=None, max_ltv=None):
+    """
+    Vectorized version of the unknown_basics price iteration.
+
+    Every row runs the same fixed-point update as the page (Price = Cash - Fees + Mortgage) and stops
+    independently once it moves by less than `tolerance` NIS, so results match the scalar loop.
+
+    Parameters:
+    - total_cash (array-like): Available cash in NIS.
+    - chosen_mortgage (array-like): Mortgage amount in NIS.
+    - is_israeli, is_first_apartment, is_oleh (bool or array-like of bool): Buyer profile flags.
+    - rules (Rules or None): The rules to apply; the active rules when None. Read once, so a
+      concurrent reload cannot change them mid-iteration.
+    - max_ltv (float or None): LTV limit overriding the profile's, e.g. rules.replacement_ltv.
+
+    Returns:
+    - result (dict): Arrays keyed like st.session_state.unknown_data ('price', 'down_payment',
+      'lawyer_fee', 'agent_fee', 'mortgage_advisor_fee', 'stamp_duty', 'total_fees', 'max_ltv')
+      plus a boolean 'valid' mask mirroring the page's error checks.
+    """
+    total_cash, chosen_mortgage, is_israeli, is_first_apartment, is_oleh = np.broadcast_arrays(
+        np.asarray(total_cash, dtype=float), np.asarray(chosen_mortgage, dtype=float),
+        np.asarray(is_israeli, dtype=bool), np.asarray(is_first_apartment, dtype=bool),
+        np.asarray(is_oleh, dtype=bool),
+    )
+    rules = rules or current_rules()
+    if max_ltv is None:
+        max_ltv = max_ltv_batch(is_israeli, is_first_apartment, rules)
+    max_ltv = np.broadcast_to(np.asarray(max_ltv, dtype=float), total_cash.shape)
+    mortgage_advisor_fee = default_advisor_fee_batch(chosen_mortgage, rules)
+
+    price_estimate = total_cash + chosen_mortgage
+    stamp_duty = np.zeros_like(price_estimate)
+    lawyer_fee = np.zeros_like(price_estimate)
+    agent_fee = np.zeros_like(price_estimate)
+    active = np.ones(price_estimate.shape, dtype=bool)
+
+    for _ in range(max_iterations):
+        # Fees are only refreshed for rows that have not converged yet
+        stamp_duty = np.where(active, purchase_tax_batch(price_estimate, is_israeli, is_first_apartment, is_oleh, rules), stamp_duty)
+        lawyer_fee = np.where(active, price_estimate * rules.lawyer_fee_rate * rules.vat, lawyer_fee)
+        agent_fee = np.where(active, price_estimate * rules.agent_fee_rate * rules.vat, agent_fee)
+        total_fees = lawyer_fee + agent_fee + mortgage_advisor_fee + stamp_duty
+
+        new_price = total_cash - total_fees + chosen_mortgage
+        moving = active & (np.abs(new_price - price_estimate) >= tolerance)
+        price_estimate = np.where(moving, new_price, price_estimate)
+        active = moving
+        if not active.any():
+            break
+
+    price = price_estimate
+    down_payment = price - chosen_mortgage
+    total_fees = lawyer_fee + agent_fee + mortgage_advisor_fee + stamp_duty
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ltv_exceeded = (chosen_mortgage > 0) & (chosen_mortgage / price > max_ltv)
+    # The price is only known to within `tolerance`, so a shortfall that small is not a lack of cash
+    valid = (total_fees + down_payment <= total_cash + tolerance) & ~ltv_exceeded & (price > 0)
+
+    return {
+        'price': price,
+        'down_payment': down_payment,
+        'lawyer_fee': lawyer_fee,
+        'agent_fee': agent_fee,
+        'mortgage_advisor_fee': mortgage_advisor_fee,
+        'stamp_duty': stamp_duty,
+        'total_fees': total_fees,
+        'max_ltv': max_ltv,
+        'valid': valid,
+    }
+
+
+def max_affordable_batch(total_cash, is_israeli, is_first_apartment, is_oleh, rules=None, max_ltv=None, precision=1.0):
+    """
+    The maximum affordable price: affordable_price_batch at the largest mortgage that is still valid.
+
+    A larger mortgage raises both the price and the loan-to-value ratio, so every row bisects the
+    mortgage between zero and the amount at which the down payment alone would use all the cash.
+
+    Parameters:
+    - total_cash (array-like): Available cash in NIS.
+    - is_israeli, is_first_apartment, is_oleh (bool or array-like of bool): Buyer profile flags.
+    - rules (Rules or None): The rules to apply; the active rules when None.
+    - max_ltv (float or None): LTV limit overriding the profile's, e.g. rules.replacement_ltv.
+    - precision (float): Bisection stops once every row's mortgage is known to within this many NIS.
+
+    Returns:
+    - mortgage (np.ndarray): The largest valid mortgage in whole NIS.
+    - result (dict): affordable_price_batch at that mortgage.
+    """
+    total_cash, is_israeli, is_first_apartment, is_oleh = np.broadcast_arrays(
+        np.asarray(total_cash, dtype=float), np.asarray(is_israeli, dtype=bool),
+        np.asarray(is_first_apartment, dtype=bool), np.asarray(is_oleh, dtype=bool),
+    )
+    rules = rules or current_rules()
+    if max_ltv is None:
+        max_ltv = max_ltv_batch(is_israeli, is_first_apartment, rules)
+    max_ltv = np.broadcast_to(np.asarray(max_ltv, dtype=float), total_cash.shape)
+
+    low = np.zeros_like(total_cash)
+    high = total_cash * max_ltv / np.maximum(1 - max_ltv, 0.01) + precision
+    while (high - low > precision).any():
+        middle = (low + high) / 2
+        valid = affordable_price_batch(total_cash, middle, is_israeli, is_first_apartment, is_oleh, rules=rules, max_ltv=max_ltv)['valid']
+        low = np.where(valid, middle, low)
+        high = np.where(valid, high, middle)
+
+    mortgage = np.floor(low)
+    return mortgage, affordable_price_batch(total_cash, mortgage, is_israeli, is_first_apartment, is_oleh, rules=rules, max_ltv=max_ltv)
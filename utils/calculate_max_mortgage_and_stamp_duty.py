@@ -45,4 +45,31 @@ def calculate_mort_and_tax(price, is_israeli, is_first_apartment, mortgage_amoun
 
     else:
         stamp_duty = price * 0.08
-    return max_mortgage, stamp_duty
\ No newline at end of file
+    return max_mortgage, stamp_duty
+
+
+# === Oleh Hadash purchase tax helper ===
+def calc_purchase_tax_oleh(price: float) -> float:
+    """
+    Purchase tax for Oleh Hadash (single residential home).
+    Brackets (approx., as commonly referenced):
+      0      – 1,978,745   : 0%
+      1,978,745 – 6,055,070: 0.5%
+      6,055,070 – 20,183,565: 8%
+      20,183,565+          : 10%
+    """
+    brackets = [
+        (0, 1_978_745, 0.00),
+        (1_978_745, 6_055_070, 0.005),
+        (6_055_070, 20_183_565, 0.08),
+        (20_183_565, float("inf"), 0.10),
+    ]
+    tax = 0.0
+    for lower, upper, rate in brackets:
+        if price <= lower:
+            break
+        taxable = min(price, upper) - lower
+        if taxable > 0:
+            tax += taxable * rate
+    return tax
+# === End of Oleh Hadash helper ===
@@ -0,0 +1,219 @@
+import argparse
+import atexit
+import glob
+import logging
+import os
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is in requirements.txt; .npz is only a fallback for installs without it
+    pa = pq = None
+
+# Opt-in analytics log of the scenarios users calculate.
+#
+# record() only appends to an in-memory deque, so the rerun path does no I/O and takes no lock.
+# A background thread drains the buffer every `flush_interval` seconds (or sooner when a file's worth
+# of rows is waiting) and writes each batch as a new immutable columnar file:
+#   <directory>/date=YYYY-MM-DD/calculations-<HHMMSS>-<seq>.parquet  (.npz without pyarrow)
+# Files are written under a temporary name and renamed, so readers never see a partial file.
+
+LOG_DIR_ENV = "APARTMENT_CALC_LOG_DIR"
+
+logger = logging.getLogger(__name__)
+
+# Column -> dtype and the value used when an event does not have it
+EVENT_COLUMNS = {
+    'timestamp': ("datetime64[ms]", np.datetime64("NaT")),
+    'page': ("U32", ""),
+    'price': ("float64", np.nan),
+    'mortgage_amount': ("float64", np.nan),
+    'total_cash': ("float64", np.nan),
+    'is_israeli': ("bool", False),
+    'is_first_apartment': ("bool", False),
+    'is_oleh': ("bool", False),
+    'mortgage_years': ("int16", 0),
+    'stamp_duty': ("float64", np.nan),
+    'total_fees': ("float64", np.nan),
+    'rules_generation': ("int32", 0),
+}
+
+
+class CalculationLog:
+    """
+    Buffered, append-only log of calculated scenarios with a background writer.
+
+    Parameters:
+    - directory (str): Root directory of the log files.
+    - flush_interval (float): Seconds between flushes.
+    - rows_per_file (int): Maximum rows in one file; a full buffer triggers an early flush.
+    - max_buffered (int): Events beyond this many unflushed rows are dropped (counted in `dropped`)
+      rather than slowing down the app.
+
+    A failed write is logged and its rows stay buffered for the next flush (counted in `failed_writes`).
+    If the writer thread is gone, record() drops events instead of buffering them forever.
+    """
+
+    def __init__(self, directory, flush_interval=10.0, rows_per_file=50_000, max_buffered=500_000):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.rows_per_file = rows_per_file
+        self.max_buffered = max_buffered
+        self.dropped = 0
+        self.failed_writes = 0
+        self._writer_lost = False
+        self.extension = ".parquet" if pq is not None else ".npz"
+        self._buffer = deque()
+        self._sequence = 0
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="calculation-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, page, **values):
+        """
+        Queue one calculated scenario. Keys of `values` are EVENT_COLUMNS names; unknown keys are ignored.
+        """
+        if not self._thread.is_alive():
+            if not self._writer_lost and not self._stopped.is_set():
+                logger.error("Calculation log writer is not running; dropping events")
+            self._writer_lost = True
+            self.dropped += 1
+            return
+        if len(self._buffer) >= self.max_buffered:
+            self.dropped += 1
+            return
+        self._buffer.append((np.datetime64("now", "ms"), page, values))
+        if len(self._buffer) >= self.rows_per_file:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Write everything buffered so far, at most `rows_per_file` rows per file.
+
+        Raises:
+        - OSError: If a batch cannot be written; its rows are put back in the buffer first.
+        """
+        with self._write_lock:
+            while self._buffer:
+                rows = []
+                while self._buffer and len(rows) < self.rows_per_file:
+                    rows.append(self._buffer.popleft())
+                try:
+                    self._write(_to_columns(rows))
+                except Exception:
+                    # Keep the batch, in order, for the next flush
+                    self._buffer.extendleft(reversed(rows))
+                    raise
+
+    def close(self):
+        """
+        Stop the writer thread and flush the remaining events.
+        """
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+        self._flush_logged()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            self.failed_writes += 1
+            logger.exception("Writing the calculation log failed; %d rows kept for the next flush", len(self._buffer))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush_logged()
+
+    def _write(self, columns):
+        first = columns['timestamp'][0].astype("datetime64[s]").item()
+        partition = os.path.join(self.directory, f"date={first:%Y-%m-%d}")
+        os.makedirs(partition, exist_ok=True)
+        self._sequence += 1
+        path = os.path.join(partition, f"calculations-{first:%H%M%S}-{os.getpid()}-{self._sequence:06d}{self.extension}")
+        temporary = path + ".tmp"
+        try:
+            if pq is not None:
+                pq.write_table(pa.table(columns), temporary, compression="zstd")
+            else:
+                with open(temporary, "wb") as f:
+                    np.savez_compressed(f, **columns)
+            os.replace(temporary, path)
+        except Exception:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+
+def _to_columns(rows):
+    columns = {}
+    for name, (dtype, missing) in EVENT_COLUMNS.items():
+        if name == 'timestamp':
+            values = [timestamp for timestamp, _, _ in rows]
+        elif name == 'page':
+            values = [page for _, page, _ in rows]
+        else:
+            values = [event.get(name, missing) for _, _, event in rows]
+        columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+def open_calculation_log(directory=None, **kwargs):
+    """
+    Start a CalculationLog in `directory`, or in the directory named by the APARTMENT_CALC_LOG_DIR
+    environment variable. Returns None when neither is set, which leaves logging off.
+    """
+    directory = directory or os.environ.get(LOG_DIR_ENV)
+    return CalculationLog(directory, **kwargs) if directory else None
+
+
+def read_calculation_log(directory, columns=None, dates=None):
+    """
+    Load the log into a DataFrame for offline analysis.
+
+    Parameters:
+    - directory (str): The log's root directory.
+    - columns (list or None): Columns to load; all of EVENT_COLUMNS when None.
+    - dates (list or None): 'YYYY-MM-DD' partitions to scan; all when None.
+
+    Returns:
+    - events (pd.DataFrame): One row per logged calculation.
+    """
+    columns = list(columns or EVENT_COLUMNS)
+    partitions = [f"date={d}" for d in dates] if dates else ["date=*"]
+    paths = sorted(path for partition in partitions
+                   for path in glob.glob(os.path.join(directory, partition, "calculations-*")) if not path.endswith(".tmp"))
+    frames = []
+    for path in paths:
+        if path.endswith(".parquet"):
+            frames.append(pd.read_parquet(path, columns=columns))
+        else:
+            with np.load(path) as batch:
+                frames.append(pd.DataFrame({name: batch[name] for name in columns}))
+    if not frames:
+        return pd.DataFrame({name: np.array([], dtype=EVENT_COLUMNS[name][0]) for name in columns})
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the calculation log.")
+    parser.add_argument("directory", help="The log's root directory")
+    parser.add_argument("--date", action="append", help="Only this YYYY-MM-DD partition (repeatable)")
+    args = parser.parse_args()
+
+    events = read_calculation_log(args.directory, dates=args.date)
+    print(f"{len(events):,} calculations")
+    for page, group in events.groupby('page'):
+        prices = group['price'].dropna()
+        print(f"{page}: {len(group):,} calculations, median price {prices.median():,.0f} NIS, "
+              f"first apartment {group['is_first_apartment'].mean():.0%}, oleh {group['is_oleh'].mean():.0%}")
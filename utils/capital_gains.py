@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from utils.cpi import cpi_ratio
+
+# Betterment tax (mas shevach) on the real gain of an individual
+BETTERMENT_TAX_RATE = 0.25
+# Under the linear exemption, the share of the holding period before this date is exempt
+LINEAR_EXEMPTION_DATE = np.datetime64("2014-01-01")
+
+
+def betterment_tax_batch(sale_price, purchase_price, purchase_date, sale_date, cpi_table, purchase_expenses,
+                         sale_expenses=0.0, linear_exemption=False):
+    """
+    Betterment tax for a whole portfolio of sales in one vectorized pass.
+
+    - The cost basis and purchase expenses are linked to the CPI between purchase and sale; the
+      inflationary amount is not taxed.
+    - Sale expenses (agent, lawyer) are deducted at their nominal value.
+    - With the linear exemption, the real gain is split by days held before and after 1.1.2014 and only
+      the later part is taxed.
+
+    Parameters:
+    - sale_price, purchase_price (array-like): Prices in NIS.
+    - purchase_date, sale_date (array-like): Dates, anything np.datetime64 accepts.
+    - cpi_table (tuple): From utils.cpi.load_cpi_table.
+    - purchase_expenses (array-like): Deductible purchase costs (tax, fees, improvements) as actually
+      paid. They are not estimated, because the brackets and fees in force at the purchase date are
+      not the current rules.
+    - sale_expenses (array-like): Deductible selling costs in NIS.
+    - linear_exemption (bool or array-like of bool): Whether the holding qualifies for the linear split.
+
+    Returns:
+    - result (dict): Arrays 'nominal_gain', 'inflationary_amount', 'real_gain', 'taxable_gain'
+      and 'betterment_tax'.
+    """
+    sale_price = np.asarray(sale_price, dtype=float)
+    purchase_price = np.asarray(purchase_price, dtype=float)
+    purchase_date = np.asarray(purchase_date, dtype="datetime64[D]")
+    sale_date = np.asarray(sale_date, dtype="datetime64[D]")
+    purchase_expenses = np.asarray(purchase_expenses, dtype=float)
+
+    linkage = cpi_ratio(purchase_date, sale_date, cpi_table)
+    cost = purchase_price + purchase_expenses
+    nominal_gain = sale_price - cost - sale_expenses
+    inflationary_amount = np.clip(cost * (linkage - 1), 0, np.maximum(nominal_gain, 0))
+    real_gain = np.maximum(nominal_gain - inflationary_amount, 0)
+
+    days_held = (sale_date - purchase_date).astype(float)
+    days_taxed = (sale_date - np.maximum(purchase_date, LINEAR_EXEMPTION_DATE)).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        taxed_share = np.where(days_held > 0, np.clip(days_taxed / days_held, 0, 1), 1.0)
+    taxable_gain = real_gain * np.where(linear_exemption, taxed_share, 1.0)
+
+    return {
+        'nominal_gain': nominal_gain,
+        'inflationary_amount': inflationary_amount,
+        'real_gain': real_gain,
+        'taxable_gain': taxable_gain,
+        'betterment_tax': taxable_gain * BETTERMENT_TAX_RATE,
+    }
+
+
+def betterment_tax_portfolio(holdings, cpi_table, chunk_size=500_000):
+    """
+    Betterment tax for a DataFrame of holdings, processed in chunks.
+
+    Parameters:
+    - holdings (pd.DataFrame): Columns 'sale_price', 'purchase_price', 'purchase_date', 'sale_date',
+      'purchase_expenses', and optionally 'sale_expenses' and 'linear_exemption'.
+
+    Returns:
+    - result (pd.DataFrame): `holdings` with the betterment_tax_batch columns appended.
+
+    Raises:
+    - ValueError: If a required column is missing.
+    """
+    missing = [column for column in ('sale_price', 'purchase_price', 'purchase_date', 'sale_date', 'purchase_expenses')
+               if column not in holdings]
+    if missing:
+        raise ValueError(f"holdings is missing the columns {missing}")
+    parts = []
+    for start in range(0, len(holdings), chunk_size):
+        chunk = holdings.iloc[start:start + chunk_size]
+        result = betterment_tax_batch(
+            chunk['sale_price'], chunk['purchase_price'], chunk['purchase_date'], chunk['sale_date'], cpi_table,
+            chunk['purchase_expenses'],
+            sale_expenses=chunk.get('sale_expenses', 0.0),
+            linear_exemption=chunk.get('linear_exemption', False),
+        )
+        parts.append(pd.concat([chunk, pd.DataFrame(result, index=chunk.index)], axis=1))
+    return pd.concat(parts) if parts else holdings.copy()
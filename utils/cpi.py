@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# Consumer price index table for the sale side: betterment tax links the cost basis to the CPI.
+# Expected file: CSV with columns month (YYYY-MM) and index (the published CPI for that month,
+# any base), e.g. exported from the Central Bureau of Statistics.
+
+_cpi_tables = {}
+
+
+def load_cpi_table(path):
+    """
+    Load a monthly CPI table, cached per path.
+
+    Returns:
+    - table (tuple): (months as np.datetime64[M] array in ascending order, index values array).
+    """
+    if path not in _cpi_tables:
+        frame = pd.read_csv(path).sort_values('month')
+        months = frame['month'].to_numpy(dtype="datetime64[M]")
+        _cpi_tables[path] = (months, frame['index'].to_numpy(dtype=float))
+    return _cpi_tables[path]
+
+
+def cpi_at(dates, table):
+    """
+    CPI in effect on each date (the latest published month not after it), vectorized.
+
+    Parameters:
+    - dates (array-like): Dates or months, anything np.datetime64 accepts.
+    - table (tuple): From load_cpi_table.
+
+    Raises:
+    - ValueError: If a date is before the first month in the table.
+    """
+    months, values = table
+    dates = np.asarray(dates, dtype="datetime64[M]")
+    position = np.searchsorted(months, dates, side="right") - 1
+    if (position < 0).any():
+        raise ValueError("Date before the start of the CPI table")
+    return values[position]
+
+
+def cpi_ratio(from_dates, to_dates, table):
+    """
+    Index linkage factor CPI(to) / CPI(from) for each pair of dates.
+    """
+    return cpi_at(to_dates, table) / cpi_at(from_dates, table)
@@ -0,0 +1,69 @@
+import csv
+import os
+import time
+
+import numpy as np
+
+# Rates file with columns: currency, nis_per_unit, as_of
+FX_RATES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fx_rates.csv")
+FX_CACHE_SECONDS = 3600
+
+_rates_cache = {}
+
+
+def load_fx_rates(path=FX_RATES_PATH, max_age=FX_CACHE_SECONDS):
+    """
+    Read the FX rate table, caching it for `max_age` seconds (or until the file changes).
+
+    All calculations stay in NIS; rates are only used to present results in other currencies.
+
+    Returns:
+    - rates (dict): Currency code -> NIS per one unit of that currency, always including "NIS": 1.0.
+    """
+    mtime = os.path.getmtime(path)
+    cached = _rates_cache.get(path)
+    if cached is not None:
+        loaded_at, loaded_mtime, rates = cached
+        if time.monotonic() - loaded_at < max_age and loaded_mtime == mtime:
+            return rates
+
+    rates = {"NIS": 1.0}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            rate = float(row['nis_per_unit'])
+            if rate <= 0:
+                raise ValueError(f"Invalid FX rate for {row['currency']}: {rate}")
+            rates[row['currency'].strip().upper()] = rate
+    _rates_cache[path] = (time.monotonic(), mtime, rates)
+    return rates
+
+
+def convert_from_nis(amounts, currencies, rates=None):
+    """
+    Convert a whole vector of NIS amounts into several currencies at once.
+
+    Parameters:
+    - amounts (array-like): Amounts in NIS.
+    - currencies (sequence of str): Target currency codes.
+    - rates (dict or None): From load_fx_rates; loaded from the default file when None.
+
+    Returns:
+    - converted (dict): Currency code -> np.ndarray of amounts in that currency.
+    """
+    if rates is None:
+        rates = load_fx_rates()
+    amounts = np.asarray(amounts, dtype=float)
+    nis_per_unit = np.array([rates[currency] for currency in currencies])
+    table = amounts[None, :] / nis_per_unit[:, None]
+    return dict(zip(currencies, table))
+
+
+def add_currency_columns(summary_data, currencies, rates=None):
+    """
+    Add an "Amount (<currency>)" column per currency to an Item / "Amount (NIS)" summary table.
+    """
+    converted = convert_from_nis(summary_data["Amount (NIS)"], currencies, rates)
+    result = dict(summary_data)
+    for currency, amounts in converted.items():
+        result[f"Amount ({currency})"] = amounts.tolist()
+    return result
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from time import perf_counter
+
+from utils.rules import current_rules
+
+
+@dataclass(frozen=True, slots=True)
+class DealResult:
+    """
+    Everything computed for one deal by compute_deal. Immutable.
+
+    `total_cash` is the cash the buyer needs: price - mortgage + total_fees.
+    `timings` holds (step, seconds) pairs for each pipeline step, in order.
+    """
+    price: float
+    mortgage_amount: float
+    max_mortgage: float
+    stamp_duty: float
+    agent_fee: float
+    lawyer_fee: float
+    mortgage_advisor_fee: float
+    total_fees: float
+    total_cash: float
+    mortgage_years: int
+    monthly_payment: float
+    timings: tuple
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'timings'}
+
+
+def estimate_monthly_payment(mortgage_amount: float, mortgage_years: int, rules=None) -> float:
+    """
+    Estimated monthly payment, using the fixed factor per 1,000,000 NIS for the term.
+
+    Raises:
+    - ValueError: If there is no payment factor for the term.
+    """
+    payment_per_million = (rules or current_rules()).payment_per_million
+    if mortgage_years not in payment_per_million:
+        raise ValueError(f"Unsupported mortgage term: {mortgage_years} years (supported: {sorted(payment_per_million)})")
+    return (mortgage_amount / 1000000) * payment_per_million[mortgage_years]
+
+
+def compute_deal(price: float, mortgage_amount: float, is_israeli: bool, is_first_apartment: bool, is_oleh: bool,
+                 mortgage_years: int = 20, agent_fee: float = None, lawyer_fee: float = None,
+                 mortgage_advisor_fee: float = None, rules=None) -> DealResult:
+    """
+    The single computation pipeline shared by the known-deal and budget flows.
+
+    Parameters:
+    - price (float): The price of the apartment in NIS.
+    - mortgage_amount (float): The mortgage taken in NIS.
+    - is_israeli, is_first_apartment, is_oleh (bool): Buyer profile.
+    - mortgage_years (int): Mortgage term, 20 or 30.
+    - agent_fee, lawyer_fee, mortgage_advisor_fee (float or None): Fees the user already knows,
+      including VAT. None means the default fee.
+    - rules (Rules or None): The rules to apply; the active rules when None. Every step uses the
+      same rules even if a reload happens meanwhile.
+
+    Returns:
+    - result (DealResult): The deal's costs and per-step timings.
+    """
+    rules = rules or current_rules()
+    timings = []
+
+    start = perf_counter()
+    # Same results as calculate_mort_and_tax with the Oleh override, using the active rules
+    max_mortgage = price * rules.max_ltv(is_israeli, is_first_apartment)
+    stamp_duty = rules.purchase_tax(price, is_israeli, is_first_apartment, is_oleh)
+    timings.append(("purchase_tax", perf_counter() - start))
+
+    start = perf_counter()
+    if agent_fee is None:
+        agent_fee = price * rules.agent_fee_rate * rules.vat
+    if lawyer_fee is None:
+        lawyer_fee = price * rules.lawyer_fee_rate * rules.vat
+    if mortgage_advisor_fee is None:
+        if mortgage_amount == 0:
+            mortgage_advisor_fee = 0
+        else:
+            mortgage_advisor_fee = max(rules.min_advisor_fee, mortgage_amount * rules.advisor_fee_rate) * rules.vat
+    total_fees = lawyer_fee + agent_fee + mortgage_advisor_fee + stamp_duty
+    timings.append(("fees", perf_counter() - start))
+
+    start = perf_counter()
+    payment = estimate_monthly_payment(mortgage_amount, mortgage_years, rules)
+    timings.append(("mortgage", perf_counter() - start))
+
+    return DealResult(
+        price=price,
+        mortgage_amount=mortgage_amount,
+        max_mortgage=max_mortgage,
+        stamp_duty=stamp_duty,
+        agent_fee=agent_fee,
+        lawyer_fee=lawyer_fee,
+        mortgage_advisor_fee=mortgage_advisor_fee,
+        total_fees=total_fees,
+        total_cash=price - mortgage_amount + total_fees,
+        mortgage_years=mortgage_years,
+        monthly_payment=payment,
+        timings=tuple(timings),
+    )
@@ -0,0 +1,172 @@
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.agorot import known_deal_costs_agorot, to_nis
+from utils.batch_calculations import (
+    FIRST_HOME_BRACKETS,
+    OLEH_BRACKETS,
+    affordable_price_batch,
+    default_advisor_fee_batch,
+    purchase_tax_batch,
+)
+from utils.calculate_max_mortgage_and_stamp_duty import calc_purchase_tax_oleh, calculate_mort_and_tax
+
+# Differential harness: random deals are run through the batch engines and through the scalar reference
+# implementations, and any row where they disagree is reported with a one-line reproducer.
+# Run with: python -m utils.differential_check --deals 1000000
+
+# Prices that sit on a bracket boundary, plus the advisor fee threshold where 1% of the mortgage equals 7,500
+EDGE_PRICES = sorted({b for brackets in (FIRST_HOME_BRACKETS, OLEH_BRACKETS) for b, _, _ in brackets[1:]})
+ADVISOR_THRESHOLD_MORTGAGE = 750_000
+# Absolute tolerance in NIS; the agorot engine also allows for its two rounding steps per fee
+FLOAT_TOLERANCE = 1e-6
+AGOROT_TOLERANCE = 0.02
+
+
+def reference_affordable_price(total_cash, chosen_mortgage, is_israeli, is_first_apartment, is_oleh):
+    """
+    The unknown_basics price iteration from app.py, one deal at a time.
+    """
+    price_estimate = total_cash + chosen_mortgage
+    for iteration in range(15):
+        if chosen_mortgage == 0:
+            mortgage_advisor_fee = 0
+        else:
+            mortgage_advisor_fee = max(7500, chosen_mortgage * 0.01) * 1.18
+        if is_oleh and is_first_apartment:
+            stamp_duty = calc_purchase_tax_oleh(price_estimate)
+        else:
+            _, stamp_duty = calculate_mort_and_tax(price_estimate, is_israeli, is_first_apartment, chosen_mortgage)
+        lawyer_fee = price_estimate * 0.01 * 1.18
+        agent_fee = price_estimate * 0.015 * 1.18
+        total_fees = lawyer_fee + agent_fee + mortgage_advisor_fee + stamp_duty
+        new_price = total_cash - total_fees + chosen_mortgage
+        if abs(new_price - price_estimate) < 100:
+            break
+        price_estimate = new_price
+    return price_estimate, total_fees
+
+
+def reference_purchase_tax(price, is_israeli, is_first_apartment, is_oleh):
+    """
+    Purchase tax as computed on known_basics, including the Oleh override.
+    """
+    _, stamp_duty = calculate_mort_and_tax(price, is_israeli, is_first_apartment, 0)
+    if is_oleh and is_first_apartment:
+        stamp_duty = calc_purchase_tax_oleh(price)
+    return stamp_duty
+
+
+def generate_deals(n, seed):
+    """
+    Random deals with a heavy share of edge cases: bracket boundaries (and one NIS / half an agora
+    either side), zero mortgages and mortgages around the advisor fee minimum.
+    """
+    rng = np.random.default_rng(seed)
+    price = rng.uniform(0, 30_000_000, n).round(2)
+    on_edge = rng.random(n) < 0.3
+    offsets = rng.choice([-1, -0.005, 0, 0.005, 1], n)
+    price[on_edge] = rng.choice(EDGE_PRICES, on_edge.sum()) + offsets[on_edge]
+
+    mortgage = (price * rng.uniform(0, 0.75, n)).round(0)
+    mortgage[rng.random(n) < 0.15] = 0
+    near_minimum = rng.random(n) < 0.15
+    mortgage[near_minimum] = ADVISOR_THRESHOLD_MORTGAGE + rng.integers(-2, 3, near_minimum.sum())
+
+    return {
+        'price': price,
+        'mortgage': mortgage,
+        'total_cash': rng.uniform(100_000, 10_000_000, n).round(0),
+        'is_israeli': rng.random(n) < 0.5,
+        'is_first_apartment': rng.random(n) < 0.5,
+        'is_oleh': rng.random(n) < 0.3,
+    }
+
+
+def _reproducer(engine, deals, i):
+    flags = f"{bool(deals['is_israeli'][i])}, {bool(deals['is_first_apartment'][i])}, {bool(deals['is_oleh'][i])}"
+    if engine == "affordable_price_batch":
+        return f"reference_affordable_price({deals['total_cash'][i]!r}, {deals['mortgage'][i]!r}, {flags})"
+    if engine == "default_advisor_fee_batch":
+        return f"max(7500, {deals['mortgage'][i]!r} * 0.01) * 1.18"
+    return f"reference_purchase_tax({deals['price'][i]!r}, {flags})"
+
+
+def check_chunk(n, seed):
+    """
+    Compare every batch engine against the scalar reference on one chunk of random deals.
+
+    Returns:
+    - mismatches (list of dict): engine, expected, actual and reproducer for the smallest failing
+      price per engine (empty when everything matches).
+    """
+    deals = generate_deals(n, seed)
+    flags = (deals['is_israeli'], deals['is_first_apartment'], deals['is_oleh'])
+    rows = list(zip(deals['price'], deals['mortgage'], deals['total_cash'], *flags))
+
+    expected_tax = np.array([reference_purchase_tax(p, *f) for p, _, _, *f in rows])
+    expected_advisor = np.array([0 if m == 0 else max(7500, m * 0.01) * 1.18 for _, m, _, *_ in rows])
+    expected_affordable = np.array([reference_affordable_price(c, m, *f) for _, m, c, *f in rows])
+
+    results = {
+        "purchase_tax_batch": (expected_tax, purchase_tax_batch(deals['price'], *flags), FLOAT_TOLERANCE),
+        "default_advisor_fee_batch": (expected_advisor, default_advisor_fee_batch(deals['mortgage']), FLOAT_TOLERANCE),
+        "known_deal_costs_agorot": (
+            expected_tax,
+            to_nis(known_deal_costs_agorot(deals['price'], deals['mortgage'], *flags)['stamp_duty']),
+            AGOROT_TOLERANCE,
+        ),
+        "affordable_price_batch": (
+            expected_affordable[:, 0],
+            affordable_price_batch(deals['total_cash'], deals['mortgage'], *flags)['price'],
+            FLOAT_TOLERANCE,
+        ),
+    }
+
+    mismatches = []
+    for engine, (expected, actual, tolerance) in results.items():
+        failing = np.flatnonzero(np.abs(expected - actual) > tolerance + 1e-12 * np.abs(expected))
+        if failing.size:
+            i = failing[np.argmin(deals['price'][failing])]
+            mismatches.append({
+                'engine': engine,
+                'count': int(failing.size),
+                'expected': float(expected[i]),
+                'actual': float(actual[i]),
+                'reproducer': _reproducer(engine, deals, i),
+            })
+    return mismatches
+
+
+def run(deals=1_000_000, chunk_size=50_000, workers=None, seed=0):
+    """
+    Check `deals` random deals in parallel chunks and return the merged mismatches.
+    """
+    sizes = [min(chunk_size, deals - start) for start in range(0, deals, chunk_size)]
+    seeds = [seed + i for i in range(len(sizes))]
+    mismatches = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(check_chunk, sizes, seeds):
+            mismatches.extend(chunk)
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the batch engines against the scalar reference.")
+    parser.add_argument("--deals", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    found = run(args.deals, args.chunk_size, args.workers, args.seed)
+    if not found:
+        print(f"OK: {args.deals:,} deals, no mismatches")
+        sys.exit(0)
+    for mismatch in found:
+        print(f"MISMATCH {mismatch['engine']} ({mismatch['count']} rows in chunk): "
+              f"expected {mismatch['expected']!r}, got {mismatch['actual']!r}\n  {mismatch['reproducer']}")
+    sys.exit(1)
@@ -0,0 +1,82 @@
+import numpy as np
+
+from utils.batch_calculations import max_ltv_batch
+from utils.refinance import annuity_payment
+
+# Bank of Israel lending limits
+MAX_PAYMENT_TO_INCOME = 0.50
+MAX_VARIABLE_SHARE = 2 / 3
+MAX_TERM_YEARS = 30
+# Common bank practice: the loan must be repaid by this age
+MAX_AGE_AT_MATURITY = 80
+
+CONSTRAINTS = ("ltv", "payment_to_income", "variable_share", "term", "age")
+# How each constraint is named to users
+CONSTRAINT_LABELS = {
+    "ltv": "the loan-to-value limit",
+    "payment_to_income": f"a monthly payment of at most {MAX_PAYMENT_TO_INCOME:.0%} of net income",
+    "variable_share": f"a variable-rate share of at most {MAX_VARIABLE_SHARE:.0%}",
+    "term": f"a term of at most {MAX_TERM_YEARS} years",
+    "age": f"repayment by age {MAX_AGE_AT_MATURITY}",
+}
+
+
+def check_eligibility(net_monthly_income, age, loan_amount, price, term_years, is_israeli, is_first_apartment,
+                      variable_share=0.0, monthly_payment=None, annual_rate=0.05, max_ltv=None):
+    """
+    Screen many applicant and loan combinations against the lending limits at once.
+
+    All arguments broadcast against each other, so passing applicants as a column (shape (A, 1))
+    and candidate loans as a row (shape (1, L)) screens the full A x L grid in one call.
+
+    Each constraint is expressed as utilization (value / limit). A combination passes when every
+    utilization is at most 1. The binding constraint is the one that fails worst, or for a pass, the
+    one closest to its limit among those not already at it. A 30-year term sits exactly at the term
+    limit, and reporting it for every such loan would say nothing about the loan.
+
+    Parameters:
+    - net_monthly_income (array-like): Household net income per month in NIS.
+    - age (array-like): Age of the oldest borrower in years.
+    - loan_amount (array-like): Requested mortgage in NIS.
+    - price (array-like): Apartment price in NIS.
+    - term_years (array-like): Mortgage term in years.
+    - is_israeli, is_first_apartment (bool or array-like of bool): Buyer profile, for the LTV limit.
+    - variable_share (array-like): Share of the loan in variable-rate tracks.
+    - monthly_payment (array-like or None): Proposed payment; estimated from `annual_rate` when None.
+    - annual_rate (array-like): Rate used to estimate the payment.
+    - max_ltv (array-like or None): LTV limit overriding the profile's, e.g. rules.replacement_ltv.
+
+    Returns:
+    - result (dict): 'passes' (bool array), 'binding' (array of names from CONSTRAINTS),
+      'monthly_payment' and one '<constraint>_utilization' array per constraint.
+    """
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    term_years = np.asarray(term_years, dtype=float)
+    if monthly_payment is None:
+        monthly_payment = annuity_payment(loan_amount, annual_rate, term_years * 12)
+    monthly_payment = np.asarray(monthly_payment, dtype=float)
+    if max_ltv is None:
+        max_ltv = max_ltv_batch(is_israeli, is_first_apartment)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        *utilization, monthly_payment = np.broadcast_arrays(
+            loan_amount / np.asarray(price, dtype=float) / np.asarray(max_ltv, dtype=float),
+            np.where(monthly_payment > 0, monthly_payment / np.asarray(net_monthly_income, dtype=float), 0.0) / MAX_PAYMENT_TO_INCOME,
+            np.asarray(variable_share, dtype=float) / MAX_VARIABLE_SHARE,
+            term_years / MAX_TERM_YEARS,
+            (np.asarray(age, dtype=float) + term_years) / MAX_AGE_AT_MATURITY,
+            monthly_payment,
+        )
+    stacked = np.nan_to_num(np.stack(utilization), nan=np.inf)
+    passes = (stacked <= 1).all(axis=0)
+    below_limit = np.where(stacked < 1, stacked, -np.inf)
+    closest = np.where(np.isfinite(below_limit.max(axis=0)), below_limit.argmax(axis=0), stacked.argmax(axis=0))
+
+    result = {
+        'passes': passes,
+        'binding': np.array(CONSTRAINTS)[np.where(passes, closest, stacked.argmax(axis=0))],
+        'monthly_payment': monthly_payment,
+    }
+    for name, values in zip(CONSTRAINTS, utilization):
+        result[f"{name}_utilization"] = values
+    return result
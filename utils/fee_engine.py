@@ -0,0 +1,74 @@
+import numpy as np
+
+from utils.batch_calculations import default_advisor_fee_batch
+from utils.rules import current_rules
+
+# Fee name -> (column the percentage applies to, default fee function of the table and the rules)
+FEES = {
+    'agent_fee': ('price', lambda df, rules: df['price'].to_numpy(dtype=float) * rules.agent_fee_rate * rules.vat),
+    'lawyer_fee': ('price', lambda df, rules: df['price'].to_numpy(dtype=float) * rules.lawyer_fee_rate * rules.vat),
+    'mortgage_advisor_fee': ('mortgage_amount', lambda df, rules: default_advisor_fee_batch(df['mortgage_amount'], rules)),
+}
+
+
+def fee_with_overrides(base, default_fee, override_pct=None, override_nis=None, vat=None):
+    """
+    Apply the known_expenses precedence rules to whole columns at once.
+
+    For every row, in order:
+    - a percentage above zero gives base * pct / 100 + VAT,
+    - otherwise an amount above zero gives amount + VAT,
+    - otherwise, if either override was given (not NaN), the fee is 0, like the page when "I know the
+      fee" is ticked without a value,
+    - otherwise the default fee is used.
+
+    Parameters:
+    - base (array-like): The amount the percentage applies to (price, or mortgage for the advisor).
+    - default_fee (array-like): The fee used when no override is given, VAT included.
+    - override_pct (array-like or None): Per-row percentage, NaN where not given.
+    - override_nis (array-like or None): Per-row amount before VAT, NaN where not given.
+
+    Returns:
+    - fee (np.ndarray): The fee in NIS including VAT.
+    """
+    base = np.asarray(base, dtype=float)
+    nan = np.full(base.shape, np.nan)
+    pct = nan if override_pct is None else np.asarray(override_pct, dtype=float)
+    nis = nan if override_nis is None else np.asarray(override_nis, dtype=float)
+
+    known = ~np.isnan(pct) | ~np.isnan(nis)
+    use_pct = pct > 0
+    use_nis = ~use_pct & (nis > 0)
+
+    vat = current_rules().vat if vat is None else vat
+    fee = np.where(known, 0.0, np.asarray(default_fee, dtype=float))
+    fee = np.where(use_nis, nis * vat, fee)
+    return np.where(use_pct, base * (pct / 100) * vat, fee)
+
+
+def apply_known_fees(deals):
+    """
+    Reprice a table of known deals.
+
+    Parameters:
+    - deals (pd.DataFrame): Must have 'price' and 'mortgage_amount' columns. Optional override columns
+      '<fee>_pct' and '<fee>_nis' (e.g. 'agent_fee_pct', 'mortgage_advisor_fee_nis') hold per-row
+      overrides, NaN where the row has none.
+
+    Returns:
+    - fees (pd.DataFrame): A copy of `deals` with 'agent_fee', 'lawyer_fee', 'mortgage_advisor_fee'
+      and 'total_fees' columns added.
+    """
+    rules = current_rules()
+    result = deals.copy()
+    for fee_name, (base_column, default) in FEES.items():
+        result[fee_name] = fee_with_overrides(
+            deals[base_column],
+            default(deals, rules),
+            deals.get(f"{fee_name}_pct"),
+            deals.get(f"{fee_name}_nis"),
+            rules.vat,
+        )
+    result['total_fees'] = result[list(FEES)].sum(axis=1)
+    return result
+
@@ -0,0 +1,135 @@
+import numpy as np
+
+from utils.refinance import annuity_payment, remaining_balance
+
+# Monthly rent exempt from tax on the exempt track (2024 ceiling)
+RENT_EXEMPTION_CEILING = 5_654
+# Flat rate on gross rent on the 10% track
+FLAT_RENT_TAX_RATE = 0.10
+TAX_TRACKS = ("exempt", "ten_percent", "marginal")
+
+
+def implied_annual_rate(mortgage_amount, monthly_payment, mortgage_years):
+    """
+    The annual rate at which `monthly_payment` repays `mortgage_amount` over `mortgage_years`.
+
+    The mortgage pages estimate the payment with a fixed factor per million, so the rate is recovered
+    by bisection to build the amortization schedule.
+    """
+    if mortgage_amount <= 0:
+        return 0.0
+    low, high = 0.0, 1.0
+    for _ in range(60):
+        mid = (low + high) / 2
+        if annuity_payment(mortgage_amount, mid, mortgage_years * 12) > monthly_payment:
+            high = mid
+        else:
+            low = mid
+    return (low + high) / 2
+
+
+def rental_tax(annual_rent, annual_expenses, tax_track, marginal_rate):
+    """
+    Annual tax on residential rent for one of the three tracks.
+
+    - "exempt": no tax up to the monthly ceiling; above it the exemption shrinks by the excess, and the
+      taxable part is charged at `marginal_rate`.
+    - "ten_percent": 10% of gross rent, no deductions.
+    - "marginal": `marginal_rate` on rent minus expenses.
+    """
+    annual_rent = np.asarray(annual_rent, dtype=float)
+    if tax_track == "exempt":
+        monthly_excess = np.maximum(annual_rent / 12 - RENT_EXEMPTION_CEILING, 0)
+        taxable = np.minimum(2 * monthly_excess * 12, annual_rent)
+        return taxable * marginal_rate
+    if tax_track == "ten_percent":
+        return annual_rent * FLAT_RENT_TAX_RATE
+    if tax_track == "marginal":
+        return np.maximum(annual_rent - annual_expenses, 0) * marginal_rate
+    raise ValueError(f"Unknown tax track: {tax_track}")
+
+
+def npv(cash_flows, discount_rate):
+    """
+    Net present value of yearly cash flows along the last axis (year 0 first).
+    """
+    years = np.arange(cash_flows.shape[-1])
+    return (cash_flows / (1 + discount_rate) ** years).sum(axis=-1)
+
+
+def irr(cash_flows, iterations=100):
+    """
+    Internal rate of return for every cash-flow series along the last axis, by vectorized bisection.
+
+    Returns NaN where the NPV does not change sign between -99% and 100%.
+    """
+    low = np.full(cash_flows.shape[:-1], -0.99)
+    high = np.full(cash_flows.shape[:-1], 1.0)
+    npv_low = npv(cash_flows, low[..., None])
+    bracketed = np.sign(npv_low) != np.sign(npv(cash_flows, high[..., None]))
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        npv_mid = npv(cash_flows, mid[..., None])
+        same_sign = np.sign(npv_mid) == np.sign(npv_low)
+        low = np.where(same_sign, mid, low)
+        npv_low = np.where(same_sign, npv_mid, npv_low)
+        high = np.where(same_sign, high, mid)
+    return np.where(bracketed, (low + high) / 2, np.nan)
+
+
+def project_investment(deal, monthly_rents, appreciation_rates, years=20, vacancy_rate=0.04,
+                       monthly_arnona=0.0, maintenance_rate=0.05, rent_growth=0.02,
+                       tax_track="exempt", marginal_rate=0.31, discount_rate=0.05):
+    """
+    Project rental cash flows for every combination of rent and appreciation assumptions at once.
+
+    Parameters:
+    - deal (dict): st.session_state.known_data after the known flow ('price', 'mortgage_amount',
+      'stamp_duty', 'agent_fee', 'lawyer_fee', 'mortgage_advisor_fee', 'monthly_payment', 'mortgage_years').
+    - monthly_rents (array-like): Starting monthly rent scenarios in NIS.
+    - appreciation_rates (array-like): Yearly price appreciation scenarios, e.g. 0.03.
+    - years (int): Holding period; the apartment is sold at the end of the last year.
+    - vacancy_rate (float): Share of the year the apartment is empty.
+    - monthly_arnona (float): Arnona paid by the owner (e.g. during vacancies), NIS per month.
+    - maintenance_rate (float): Maintenance as a share of gross rent.
+    - rent_growth (float): Yearly rent increase.
+    - tax_track (str): One of TAX_TRACKS.
+    - marginal_rate (float): The owner's marginal income tax rate.
+    - discount_rate (float): Yearly rate for the NPV.
+
+    Returns:
+    - result (dict): 'cash_flows' with shape (rents, appreciations, years + 1), and 'irr', 'npv',
+      'sale_value' and 'first_year_net_rent' arrays over (rents, appreciations).
+    """
+    monthly_rents = np.asarray(monthly_rents, dtype=float)[:, None, None]
+    appreciation_rates = np.asarray(appreciation_rates, dtype=float)[None, :, None]
+    year = np.arange(1, years + 1)
+
+    initial_cash = (deal['price'] - deal['mortgage_amount'] + deal['stamp_duty'] + deal['agent_fee']
+                    + deal['lawyer_fee'] + deal['mortgage_advisor_fee'])
+
+    gross_rent = monthly_rents * 12 * (1 + rent_growth) ** (year - 1) * (1 - vacancy_rate)
+    expenses = gross_rent * maintenance_rate + monthly_arnona * 12
+    tax = rental_tax(gross_rent, expenses, tax_track, marginal_rate)
+    mortgage_months = deal['mortgage_years'] * 12
+    mortgage_payments = np.where(year * 12 <= mortgage_months, deal['monthly_payment'] * 12, 0.0)
+    net_rent = gross_rent - expenses - tax
+    operating = net_rent - mortgage_payments
+
+    rate = implied_annual_rate(deal['mortgage_amount'], deal['monthly_payment'], deal['mortgage_years'])
+    months_paid = min(years * 12, mortgage_months)
+    balance_at_sale = float(remaining_balance(deal['mortgage_amount'], rate, mortgage_months, months_paid))
+    sale_value = deal['price'] * (1 + appreciation_rates[..., 0]) ** years
+
+    cash_flows = np.zeros((monthly_rents.shape[0], appreciation_rates.shape[1], years + 1))
+    cash_flows[..., 0] = -initial_cash
+    cash_flows[..., 1:] = operating
+    cash_flows[..., -1] += sale_value - balance_at_sale
+
+    return {
+        'cash_flows': cash_flows,
+        'irr': irr(cash_flows),
+        'npv': npv(cash_flows, discount_rate),
+        'sale_value': np.broadcast_to(sale_value, cash_flows.shape[:-1]),
+        'first_year_net_rent': np.broadcast_to(net_rent[..., 0], cash_flows.shape[:-1]),
+    }
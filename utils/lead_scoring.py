@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.batch_calculations import (
+    affordable_price_batch,
+    default_mortgage_batch,
+    max_ltv_batch,
+    monthly_payment_batch,
+)
+from utils.eligibility import check_eligibility
+from utils.rules import current_rules
+
+# Bulk pre-approval for marketing leads.
+#
+# Leads are read from a JSON-lines file, one record per line:
+#   {"lead_id": ..., "total_cash": 1200000, "is_israeli": true, "is_first_apartment": true,
+#    "is_oleh": false, "mortgage_years": 30, "net_monthly_income": 22000, "age": 34}
+# and scored the way unknown_basics would with its default mortgage (80% of the LTV-based maximum).
+# Leads with income and age are also screened against the bank lending limits.
+# Run with: python -m utils.lead_scoring leads.jsonl scored.jsonl --batch-size 2000 --concurrency 4
+
+DEFAULT_MORTGAGE_YEARS = 30
+
+
+def score_leads(leads):
+    """
+    Score one micro-batch of leads in a single vectorized pass.
+
+    Parameters:
+    - leads (list of dict): Lead records as described above; mortgage_years defaults to 30.
+
+    Returns:
+    - scored (list of dict): One result per lead with 'lead_id', 'max_price', 'mortgage',
+      'monthly_payment', 'total_fees', 'qualified', and 'bank_eligible' / 'binding_constraint'
+      (None when the lead has no income or age). A lead with an unsupported mortgage term is not
+      qualified, has no payment or bank result, and its 'error' says why; 'error' is None otherwise.
+    """
+    rules = current_rules()
+    total_cash = np.array([lead['total_cash'] for lead in leads], dtype=float)
+    is_israeli = np.array([bool(lead.get('is_israeli')) for lead in leads])
+    is_first_apartment = np.array([bool(lead.get('is_first_apartment')) for lead in leads])
+    is_oleh = np.array([bool(lead.get('is_oleh')) for lead in leads])
+    mortgage_years = np.array([lead.get('mortgage_years', DEFAULT_MORTGAGE_YEARS) for lead in leads])
+    income = np.array([lead.get('net_monthly_income', np.nan) for lead in leads], dtype=float)
+    age = np.array([lead.get('age', np.nan) for lead in leads], dtype=float)
+
+    # Unsupported terms are rejected per lead, so one bad record does not fail its whole batch
+    supported_term = np.isin(mortgage_years, list(rules.payment_per_million))
+    scored_years = np.where(supported_term, mortgage_years, DEFAULT_MORTGAGE_YEARS)
+
+    _, mortgage = default_mortgage_batch(total_cash, max_ltv_batch(is_israeli, is_first_apartment, rules))
+    result = affordable_price_batch(total_cash, mortgage, is_israeli, is_first_apartment, is_oleh, rules=rules)
+    monthly_payment = monthly_payment_batch(mortgage, scored_years, rules)
+    qualified = result['valid'] & (total_cash > 0) & supported_term
+
+    has_bank_inputs = ~np.isnan(income) & ~np.isnan(age) & supported_term
+    eligibility = check_eligibility(income, age, mortgage, result['price'], scored_years, is_israeli,
+                                    is_first_apartment, monthly_payment=monthly_payment)
+
+    return [
+        {
+            'lead_id': lead.get('lead_id'),
+            'max_price': round(float(result['price'][i]), 2),
+            'mortgage': float(mortgage[i]),
+            'monthly_payment': round(float(monthly_payment[i]), 2) if supported_term[i] else None,
+            'total_fees': round(float(result['total_fees'][i]), 2),
+            'qualified': bool(qualified[i]),
+            'bank_eligible': bool(eligibility['passes'][i]) if has_bank_inputs[i] else None,
+            'binding_constraint': str(eligibility['binding'][i]) if has_bank_inputs[i] else None,
+            'error': None if supported_term[i] else
+                     f"Unsupported mortgage term: {mortgage_years[i]} years (supported: {sorted(rules.payment_per_million)})",
+        }
+        for i, lead in enumerate(leads)
+    ]
+
+
+async def _read_batches(input_path, batches, batch_size, concurrency):
+    batch = []
+    with open(input_path) as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                await batches.put(batch)
+                batch = []
+    if batch:
+        await batches.put(batch)
+    # One stop marker per worker
+    for _ in range(concurrency):
+        await batches.put(None)
+
+
+async def _score_batches(batches, results, executor):
+    loop = asyncio.get_running_loop()
+    while (batch := await batches.get()) is not None:
+        await results.put(await loop.run_in_executor(executor, score_leads, batch))
+    await results.put(None)
+
+
+async def _write_results(output_path, results, concurrency):
+    written = 0
+    finished_workers = 0
+    with open(output_path, "w") as f:
+        while finished_workers < concurrency:
+            scored = await results.get()
+            if scored is None:
+                finished_workers += 1
+                continue
+            f.writelines(json.dumps(row) + "\n" for row in scored)
+            written += len(scored)
+    return written
+
+
+async def run_pre_approval(input_path, output_path, batch_size=1000, concurrency=4):
+    """
+    Score every lead in `input_path` and write the results to `output_path` as JSON lines.
+
+    A reader fills a bounded queue of micro-batches, `concurrency` workers score them on a thread
+    pool (NumPy releases the GIL for the array math), and a single writer appends the results.
+    Output order follows batch completion, so results carry their lead_id.
+
+    Returns:
+    - stats (dict): 'leads', 'seconds' and 'leads_per_second'.
+    """
+    start = time.perf_counter()
+    batches = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        _, *_, written = await asyncio.gather(
+            _read_batches(input_path, batches, batch_size, concurrency),
+            *(_score_batches(batches, results, executor) for _ in range(concurrency)),
+            _write_results(output_path, results, concurrency),
+        )
+    seconds = time.perf_counter() - start
+    return {'leads': written, 'seconds': seconds, 'leads_per_second': written / seconds if seconds else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score marketing leads for mortgage pre-approval.")
+    parser.add_argument("input", help="JSON-lines file of leads")
+    parser.add_argument("output", help="JSON-lines file for the scored leads")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    stats = asyncio.run(run_pre_approval(args.input, args.output, args.batch_size, args.concurrency))
+    print(f"Scored {stats['leads']:,} leads in {stats['seconds']:.2f}s ({stats['leads_per_second']:,.0f} leads/s)")
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.batch_calculations import default_advisor_fee_batch, max_ltv_batch, purchase_tax_batch
+from utils.rules import current_rules
+
+# Listings file with at least: listing_id, price, city, rooms
+LISTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "listings.csv")
+
+
+class ListingIndex:
+    """
+    Column-oriented, price-sorted listings held in memory.
+
+    A query is a binary search on the price column followed by boolean masks for the secondary
+    filters, so matching stays in the millisecond range for millions of listings.
+    """
+
+    def __init__(self, listings: pd.DataFrame):
+        listings = listings.sort_values('price', kind="stable").reset_index(drop=True)
+        self.listings = listings
+        self.price = listings['price'].to_numpy(dtype=float)
+        self.rooms = listings['rooms'].to_numpy(dtype=float)
+        city = pd.Categorical(listings['city'])
+        self.cities = list(city.categories)
+        self.city_code = city.codes
+
+    @classmethod
+    def from_csv(cls, path=LISTINGS_PATH):
+        return cls(pd.read_csv(path))
+
+    def match(self, max_price, min_price=0, city=None, min_rooms=None, max_rooms=None):
+        """
+        Row positions (in price order) of listings within the price range and filters.
+        """
+        start = np.searchsorted(self.price, min_price, side="left")
+        stop = np.searchsorted(self.price, max_price, side="right")
+        mask = np.ones(stop - start, dtype=bool)
+        if city is not None:
+            if city not in self.cities:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.city_code[start:stop] == self.cities.index(city)
+        if min_rooms is not None:
+            mask &= self.rooms[start:stop] >= min_rooms
+        if max_rooms is not None:
+            mask &= self.rooms[start:stop] <= max_rooms
+        return start + np.flatnonzero(mask)
+
+    def affordable(self, total_cash, chosen_mortgage, is_israeli, is_first_apartment, is_oleh, max_price,
+                   city=None, min_rooms=None, max_rooms=None, limit=None, max_ltv=None):
+        """
+        Listings the buyer can afford, with each deal's full cost computed in one batch.
+
+        The mortgage for each listing is the buyer's chosen mortgage, capped at the profile's LTV
+        (or `max_ltv` when given, e.g. for a replacement home). Listings whose cash needed
+        (price - mortgage + tax + default fees) exceeds `total_cash` are dropped.
+
+        Returns:
+        - matches (pd.DataFrame): The listing columns plus 'mortgage', 'stamp_duty', 'agent_fee',
+          'lawyer_fee', 'mortgage_advisor_fee', 'total_fees' and 'cash_needed', most expensive first.
+        """
+        rules = current_rules()
+        rows = self.match(max_price, city=city, min_rooms=min_rooms, max_rooms=max_rooms)
+        price = self.price[rows]
+        if max_ltv is None:
+            max_ltv = max_ltv_batch(is_israeli, is_first_apartment, rules)
+        mortgage = np.minimum(chosen_mortgage, price * max_ltv)
+        stamp_duty = purchase_tax_batch(price, is_israeli, is_first_apartment, is_oleh, rules)
+        agent_fee = price * rules.agent_fee_rate * rules.vat
+        lawyer_fee = price * rules.lawyer_fee_rate * rules.vat
+        mortgage_advisor_fee = default_advisor_fee_batch(mortgage, rules)
+        total_fees = stamp_duty + agent_fee + lawyer_fee + mortgage_advisor_fee
+        cash_needed = price - mortgage + total_fees
+
+        keep = np.flatnonzero(cash_needed <= total_cash)[::-1]
+        if limit is not None:
+            keep = keep[:limit]
+        matches = self.listings.iloc[rows[keep]].reset_index(drop=True)
+        matches['mortgage'] = mortgage[keep]
+        matches['stamp_duty'] = stamp_duty[keep]
+        matches['agent_fee'] = agent_fee[keep]
+        matches['lawyer_fee'] = lawyer_fee[keep]
+        matches['mortgage_advisor_fee'] = mortgage_advisor_fee[keep]
+        matches['total_fees'] = total_fees[keep]
+        matches['cash_needed'] = cash_needed[keep]
+        return matches
@@ -0,0 +1,87 @@
+import numpy as np
+
+from utils.rules import current_rules
+
+# Off-plan (contractor) purchases: staged payments linked to the construction input index.
+# By default only half of the index increase is passed on to the buyer, as the Sale Law allows.
+DEFAULT_LINKAGE_SHARE = 0.5
+
+
+def simulate_index_paths(months, scenarios=1000, annual_drift=0.04, annual_volatility=0.03, seed=None):
+    """
+    Random construction-index paths, relative to 1.0 at signing.
+
+    Returns:
+    - paths (np.ndarray): Shape (scenarios, months + 1); column 0 is the signing month.
+    """
+    rng = np.random.default_rng(seed)
+    monthly_drift = np.log1p(annual_drift) / 12
+    monthly_volatility = annual_volatility / np.sqrt(12)
+    steps = rng.normal(monthly_drift, monthly_volatility, (scenarios, months))
+    return np.exp(np.concatenate([np.zeros((scenarios, 1)), np.cumsum(steps, axis=1)], axis=1))
+
+
+def simulate_payment_plan(price, payment_plan, index_paths, mortgage_amount=0, mortgage_years=30,
+                          linkage_share=DEFAULT_LINKAGE_SHARE):
+    """
+    Monthly cash needed for a contractor payment plan under many index scenarios at once.
+
+    Each installment is price x share, increased by `linkage_share` of the index rise since signing.
+    The buyer's equity (price - mortgage) is paid first, then the bank releases the mortgage for later
+    installments. Linkage beyond the mortgage is paid in cash. Repayments on each released tranche
+    start the month after it is drawn, using the mortgage pages' payment per million.
+
+    Parameters:
+    - price (float): Contract price in NIS at signing.
+    - payment_plan (sequence): (month, share) pairs, shares summing to 1; month 0 is signing.
+    - index_paths (array-like): Shape (scenarios, months + 1), e.g. from simulate_index_paths.
+    - mortgage_amount (float): Approved mortgage in NIS.
+    - mortgage_years (int): Mortgage term, 20 or 30.
+    - linkage_share (float): Share of the index increase charged to the buyer.
+
+    Returns:
+    - result (dict): Arrays of shape (scenarios, months + 1) for 'installments', 'cash_installments',
+      'mortgage_drawdown', 'mortgage_payments' and 'cash_needed', plus per-scenario 'total_price'
+      (price including linkage) and 'total_cash' (all cash paid over the plan).
+    """
+    index_paths = np.atleast_2d(np.asarray(index_paths, dtype=float))
+    scenarios, columns = index_paths.shape
+
+    schedule = np.zeros(columns)
+    for month, share in payment_plan:
+        schedule[month] += share
+    if not np.isclose(schedule.sum(), 1.0):
+        raise ValueError(f"Payment plan shares must sum to 1, got {schedule.sum():.4f}")
+
+    linkage = 1 + linkage_share * np.maximum(index_paths / index_paths[:, :1] - 1, 0)
+    installments = price * schedule * linkage
+
+    # Split cumulative payments into equity first, then mortgage, then cash for anything beyond both
+    equity = price - mortgage_amount
+    paid = np.cumsum(installments, axis=1)
+    drawn = np.clip(paid - equity, 0, mortgage_amount)
+    cash_paid = paid - drawn
+    mortgage_drawdown = np.diff(drawn, axis=1, prepend=0)
+    cash_installments = np.diff(cash_paid, axis=1, prepend=0)
+
+    # Repayments start the month after each tranche is released
+    outstanding = np.concatenate([np.zeros((scenarios, 1)), drawn[:, :-1]], axis=1)
+    mortgage_payments = outstanding / 1000000 * current_rules().payment_per_million[mortgage_years]
+    cash_needed = cash_installments + mortgage_payments
+
+    return {
+        'installments': installments,
+        'cash_installments': cash_installments,
+        'mortgage_drawdown': mortgage_drawdown,
+        'mortgage_payments': mortgage_payments,
+        'cash_needed': cash_needed,
+        'total_price': installments.sum(axis=1),
+        'total_cash': cash_needed.sum(axis=1),
+    }
+
+
+def cost_distribution(values, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Percentiles of a per-scenario result, e.g. simulate_payment_plan(...)['total_price'].
+    """
+    return dict(zip(percentiles, np.percentile(values, percentiles)))
@@ -0,0 +1,36 @@
+from utils.deal_pipeline import compute_deal
+from utils.rules import current_rules
+from utils.summary import known_summary_data, summary_excel_bytes
+
+# The fields of st.session_state.known_data that the known_summary Excel export depends on
+SUMMARY_KEYS = ('price', 'mortgage_amount', 'stamp_duty', 'agent_fee', 'lawyer_fee',
+                'mortgage_advisor_fee', 'total_fees', 'total_cash', 'mortgage_years', 'monthly_payment')
+
+
+def summary_key(data):
+    """
+    Hashable key of the inputs an Excel export depends on, used to match a prefetched file.
+    """
+    return tuple(data.get(key) for key in SUMMARY_KEYS)
+
+
+def known_flow_defaults(price, mortgage_amount, is_israeli, is_first_apartment, is_oleh):
+    """
+    Everything known_expenses, known_mortgage and known_summary compute when the user keeps the defaults.
+
+    Meant to run on a background thread as soon as known_basics is valid.
+
+    Returns:
+    - defaults (dict): 'deals' mapping each mortgage term to its DealResult, and 'excel' mapping
+      summary_key(...) to the .xlsx bytes for each of those deals.
+    """
+    rules = current_rules()
+    deals = {
+        years: compute_deal(price, mortgage_amount, is_israeli, is_first_apartment, is_oleh, years, rules=rules)
+        for years in rules.payment_per_million
+    }
+    excel = {}
+    for deal in deals.values():
+        scenario = deal.as_dict()
+        excel[summary_key(scenario)] = summary_excel_bytes(known_summary_data(scenario), "Apartment Deal Summary")
+    return {'deals': deals, 'excel': excel}
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+def annuity_payment(principal, annual_rate, months):
+    """
+    Monthly payment of a fully amortizing loan (Spitzer schedule), vectorized over any argument.
+
+    Parameters:
+    - principal (array-like): Loan amount in NIS.
+    - annual_rate (array-like): Nominal annual interest rate, e.g. 0.045 for 4.5%.
+    - months (array-like): Number of monthly payments.
+    """
+    principal = np.asarray(principal, dtype=float)
+    monthly_rate = np.asarray(annual_rate, dtype=float) / 12
+    months = np.asarray(months, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = principal * monthly_rate / (1 - (1 + monthly_rate) ** -months)
+    return np.where(monthly_rate == 0, principal / months, payment)
+
+
+def remaining_balance(principal, annual_rate, months, months_paid):
+    """
+    Outstanding principal after `months_paid` payments of a Spitzer loan.
+    """
+    principal = np.asarray(principal, dtype=float)
+    monthly_rate = np.asarray(annual_rate, dtype=float) / 12
+    payment = annuity_payment(principal, annual_rate, months)
+    growth = (1 + monthly_rate) ** months_paid
+    with np.errstate(divide="ignore", invalid="ignore"):
+        balance = principal * growth - payment * (growth - 1) / monthly_rate
+    return np.where(monthly_rate == 0, principal - payment * months_paid, balance)
+
+
+def present_value(payment, annual_rate, months):
+    """
+    Present value of `months` equal monthly payments discounted at `annual_rate`.
+    """
+    payment = np.asarray(payment, dtype=float)
+    monthly_rate = np.asarray(annual_rate, dtype=float) / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pv = payment * (1 - (1 + monthly_rate) ** -months) / monthly_rate
+    return np.where(monthly_rate == 0, payment * months, pv)
+
+
+def early_repayment_fee(balance, payment, contract_rate, market_rates, months_left, cpi_change=0.0):
+    """
+    Israeli early-repayment fee for a fixed-rate loan.
+
+    - Capitalization difference: when the market (average) rate is below the contract rate, the bank
+      charges the present value of the remaining payments at the market rate minus the balance.
+    - CPI component: for CPI-linked loans, `cpi_change` is the gap between the average index change
+      and the latest index (as a fraction); a positive gap is charged on the balance.
+
+    Parameters:
+    - balance (float): Outstanding principal in NIS.
+    - payment (float): Current monthly payment in NIS.
+    - contract_rate (float): The loan's annual rate.
+    - market_rates (array-like): Average market rates used for discounting, one per scenario.
+    - months_left (int): Remaining number of payments.
+    - cpi_change (float): CPI gap for linked loans, 0 for unlinked loans.
+
+    Returns:
+    - capitalization_fee, cpi_fee (np.ndarray): Both in NIS, one value per market rate.
+    """
+    market_rates = np.asarray(market_rates, dtype=float)
+    pv_at_market = present_value(payment, market_rates, months_left)
+    capitalization_fee = np.where(market_rates < contract_rate, np.maximum(pv_at_market - balance, 0), 0.0)
+    cpi_fee = np.full(market_rates.shape, balance * max(cpi_change, 0.0))
+    return capitalization_fee, cpi_fee
+
+
+def refinance_grid(principal, annual_rate, months, months_paid, new_rates, switching_costs=0.0, cpi_change=0.0):
+    """
+    Compare keeping an existing loan against refinancing it at each rate in `new_rates`.
+
+    The new loan repays the remaining balance over the remaining term. The early-repayment fee is
+    discounted at the new rate (taken as the market rate), and the break-even month is the first
+    month where the accumulated payment savings cover the fee plus `switching_costs`.
+
+    Parameters:
+    - principal (float): Original loan amount in NIS.
+    - annual_rate (float): Current loan annual rate.
+    - months (int): Original term in months.
+    - months_paid (int): Payments already made.
+    - new_rates (array-like): Candidate annual rates for the new loan.
+    - switching_costs (float): One-off costs of the new loan (advisor, appraisal, file fees) in NIS.
+    - cpi_change (float): CPI gap for linked loans, see early_repayment_fee.
+
+    Returns:
+    - result (dict): 'remaining_balance' and 'current_payment' (scalars), and per-rate arrays
+      'new_rate', 'new_payment', 'monthly_saving', 'capitalization_fee', 'cpi_fee', 'total_cost'
+      and 'break_even_month' (NaN where refinancing never pays off).
+    """
+    new_rates = np.asarray(new_rates, dtype=float)
+    months_left = months - months_paid
+    balance = float(remaining_balance(principal, annual_rate, months, months_paid))
+    current_payment = float(annuity_payment(principal, annual_rate, months))
+
+    new_payment = annuity_payment(balance, new_rates, months_left)
+    monthly_saving = current_payment - new_payment
+    capitalization_fee, cpi_fee = early_repayment_fee(balance, current_payment, annual_rate, new_rates, months_left, cpi_change)
+    total_cost = capitalization_fee + cpi_fee + switching_costs
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        break_even_month = np.ceil(total_cost / monthly_saving)
+    pays_off = (monthly_saving > 0) & (break_even_month <= months_left)
+    break_even_month = np.where(pays_off, np.maximum(break_even_month, 0), np.nan)
+
+    return {
+        'remaining_balance': balance,
+        'current_payment': current_payment,
+        'new_rate': new_rates,
+        'new_payment': new_payment,
+        'monthly_saving': monthly_saving,
+        'capitalization_fee': capitalization_fee,
+        'cpi_fee': cpi_fee,
+        'total_cost': total_cost,
+        'break_even_month': break_even_month,
+    }
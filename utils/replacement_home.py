@@ -0,0 +1,84 @@
+import numpy as np
+
+from utils.rules import current_rules
+
+# Replacement home ("improving apartment"): an Israeli who owns one apartment and buys another pays
+# the additional-apartment rate at purchase. If the old apartment is sold within the window, the
+# single-home brackets apply retroactively and the difference is refunded after the sale. Until the
+# sale, the old apartment's equity is usually advanced by an interest-only bridge loan.
+
+# Months between selling the old apartment and receiving the refund
+DEFAULT_REFUND_LAG_MONTHS = 3
+DEFAULT_BRIDGE_RATE = 0.065
+
+
+def replacement_tax(prices, sale_months, rules=None):
+    """
+    Purchase tax of a replacement home, depending on when the old apartment is sold.
+
+    Parameters:
+    - prices (array-like): Price of the new apartment in NIS.
+    - sale_months (array-like): Months after the purchase in which the old apartment is sold,
+      broadcast against prices.
+    - rules (Rules or None): The rules to apply; the active rules when None.
+
+    Returns:
+    - interim_tax, refund, final_tax (np.ndarray): The tax paid at purchase, the amount refunded
+      after a sale within the window, and the tax finally borne, in NIS.
+    """
+    rules = rules or current_rules()
+    prices = np.asarray(prices, dtype=float)
+    qualifies = np.asarray(sale_months) <= rules.replacement_sale_window_months
+    interim_tax = prices * rules.non_first_home_tax_rate
+    final_tax = np.where(qualifies, rules.first_home.tax_batch(prices), interim_tax)
+    return np.broadcast_to(interim_tax, final_tax.shape), interim_tax - final_tax, final_tax
+
+
+def simulate_replacement(price, sale_months, sale_prices, old_mortgage_balance=0.0, bridge_loan=0.0,
+                         bridge_rate=DEFAULT_BRIDGE_RATE, refund_lag_months=DEFAULT_REFUND_LAG_MONTHS, rules=None):
+    """
+    Tax and cash outcome of a replacement purchase for every combination of sale month and sale price.
+
+    The interim tax is paid at purchase. The bridge loan accrues interest until the old apartment
+    is sold and is then repaid from the proceeds, net of the old mortgage and the default agent and
+    lawyer fees. A sale within the window triggers the refund `refund_lag_months` later.
+
+    Parameters:
+    - price (float): Price of the new apartment in NIS.
+    - sale_months (array-like): Candidate months of the sale (grid rows).
+    - sale_prices (array-like): Candidate sale prices of the old apartment in NIS (grid columns).
+    - old_mortgage_balance (float): Mortgage on the old apartment, repaid at the sale.
+    - bridge_loan (float): Bridge loan taken at purchase in NIS.
+    - bridge_rate (float): Annual interest rate of the bridge loan.
+    - refund_lag_months (int): Months from the sale until the refund is paid.
+    - rules (Rules or None): The rules to apply; the active rules when None.
+
+    Returns:
+    - result (dict): Arrays of shape (len(sale_months), len(sale_prices)): 'qualifies', 'interim_tax',
+      'refund', 'refund_month', 'final_tax', 'bridge_interest', 'net_sale_proceeds', 'cash_at_sale'
+      (proceeds left after repaying the bridge loan), 'cash_after_refund' and 'total_cost' (tax
+      finally borne plus bridge interest).
+    """
+    rules = rules or current_rules()
+    sale_months = np.asarray(sale_months, dtype=float)[:, None]
+    sale_prices = np.asarray(sale_prices, dtype=float)[None, :]
+    shape = (sale_months.shape[0], sale_prices.shape[1])
+
+    interim_tax, refund, final_tax = replacement_tax(price, sale_months, rules)
+    sale_expenses = sale_prices * (rules.agent_fee_rate + rules.lawyer_fee_rate) * rules.vat
+    net_sale_proceeds = sale_prices - sale_expenses - old_mortgage_balance
+    bridge_interest = bridge_loan * bridge_rate / 12 * sale_months
+    cash_at_sale = net_sale_proceeds - bridge_loan - bridge_interest
+
+    return {
+        'qualifies': np.broadcast_to(sale_months <= rules.replacement_sale_window_months, shape),
+        'interim_tax': np.broadcast_to(interim_tax, shape),
+        'refund': np.broadcast_to(refund, shape),
+        'refund_month': np.broadcast_to(np.where(refund > 0, sale_months + refund_lag_months, np.nan), shape),
+        'final_tax': np.broadcast_to(final_tax, shape),
+        'bridge_interest': np.broadcast_to(bridge_interest, shape),
+        'net_sale_proceeds': np.broadcast_to(net_sale_proceeds, shape),
+        'cash_at_sale': cash_at_sale,
+        'cash_after_refund': cash_at_sale + refund,
+        'total_cost': np.broadcast_to(final_tax + bridge_interest, shape),
+    }
@@ -0,0 +1,170 @@
+import argparse
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+from string import Template
+
+import numpy as np
+
+from utils.investment import implied_annual_rate
+from utils.refinance import remaining_balance
+from utils.rules import current_rules
+from utils.scenario_link import KNOWN_FLOW, decode_scenario
+from utils.summary import known_summary_data, unknown_summary_data
+
+# HTML client reports for known_summary and unknown_details. The HTML is print-ready, so browsers
+# (or any HTML-to-PDF converter) produce the PDF without adding a dependency to the app.
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+CHART_WIDTH, CHART_HEIGHT, CHART_MARGIN = 640, 240, 40
+
+
+@lru_cache(maxsize=None)
+def load_template(name="report.html"):
+    """
+    Read and compile a report template once per process.
+    """
+    with open(os.path.join(TEMPLATES_DIR, name), encoding="utf-8") as f:
+        return Template(f.read())
+
+
+def amortization_chart_svg(mortgage_amount, monthly_payment, mortgage_years):
+    """
+    Inline SVG of the outstanding balance over the mortgage term, one point per year.
+    """
+    if mortgage_amount <= 0:
+        return '<p class="muted">Cash purchase - no mortgage.</p>'
+
+    rate = implied_annual_rate(mortgage_amount, monthly_payment, mortgage_years)
+    year = np.arange(mortgage_years + 1)
+    balance = np.maximum(remaining_balance(mortgage_amount, rate, mortgage_years * 12, year * 12), 0)
+
+    plot_width = CHART_WIDTH - 2 * CHART_MARGIN
+    plot_height = CHART_HEIGHT - 2 * CHART_MARGIN
+    x = CHART_MARGIN + year / mortgage_years * plot_width
+    y = CHART_MARGIN + (1 - balance / mortgage_amount) * plot_height
+    points = " ".join(f"{px:.1f},{py:.1f}" for px, py in zip(x, y))
+    bottom = CHART_HEIGHT - CHART_MARGIN
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{CHART_WIDTH}" height="{CHART_HEIGHT}" font-size="11">'
+        f'<line x1="{CHART_MARGIN}" y1="{bottom}" x2="{CHART_WIDTH - CHART_MARGIN}" y2="{bottom}" stroke="#999"/>'
+        f'<line x1="{CHART_MARGIN}" y1="{CHART_MARGIN}" x2="{CHART_MARGIN}" y2="{bottom}" stroke="#999"/>'
+        f'<polyline points="{points}" fill="none" stroke="#1f77b4" stroke-width="2"/>'
+        f'<text x="{CHART_MARGIN}" y="{CHART_MARGIN - 8}">{mortgage_amount:,.0f} NIS</text>'
+        f'<text x="{CHART_MARGIN}" y="{bottom + 16}">Year 0</text>'
+        f'<text x="{CHART_WIDTH - CHART_MARGIN}" y="{bottom + 16}" text-anchor="end">Year {mortgage_years}</text>'
+        f'<text x="{CHART_WIDTH / 2}" y="{bottom + 16}" text-anchor="middle">Estimated rate {rate * 100:.2f}%</text>'
+        '</svg>'
+    )
+
+
+def _assumptions(data, flow):
+    rules = current_rules()
+    profile = []
+    if data['is_israeli']:
+        profile.append("Israeli citizen")
+    if data['is_first_apartment']:
+        profile.append("first apartment")
+    if data['is_oleh']:
+        profile.append("Oleh Hadash")
+    items = [
+        f"Buyer profile: {', '.join(profile) if profile else 'foreign resident / additional apartment'}",
+        f"Default fees include {(rules.vat - 1) * 100:.0f}% VAT: agent {rules.agent_fee_rate * 100:g}%, "
+        f"lawyer {rules.lawyer_fee_rate * 100:g}%, mortgage advisor {rules.advisor_fee_rate * 100:g}% "
+        f"(minimum {rules.min_advisor_fee:,} NIS)",
+        f"Monthly payment of {rules.payment_per_million[data['mortgage_years']]:,.0f} NIS per 1,000,000 NIS over {data['mortgage_years']} years",
+    ]
+    if flow != KNOWN_FLOW:
+        items.append(f"Maximum loan-to-value: {data['max_ltv'] * 100:.0f}%")
+    return "\n".join(f"<li>{html.escape(item)}</li>" for item in items)
+
+
+def render_report(data, flow, currency_columns=None):
+    """
+    Render the client report for one scenario.
+
+    Parameters:
+    - data (dict): st.session_state.known_data (flow KNOWN_FLOW) or unknown_data (UNKNOWN_FLOW).
+    - flow (int): KNOWN_FLOW or UNKNOWN_FLOW from utils.scenario_link.
+    - currency_columns (dict or None): Summary table from add_currency_columns, to report extra currencies.
+
+    Returns:
+    - report (str): A standalone HTML document.
+    """
+    if flow == KNOWN_FLOW:
+        title = "Apartment Deal Summary"
+        summary = known_summary_data(data)
+        mortgage_amount = data['mortgage_amount']
+    else:
+        title = "Apartment Budget Analysis"
+        summary = unknown_summary_data(data)
+        mortgage_amount = data['chosen_mortgage']
+    if currency_columns is not None:
+        summary = currency_columns
+
+    amount_columns = [column for column in summary if column != "Item"]
+    rows = "\n".join(
+        f"<tr><td>{html.escape(item)}</td>"
+        + "".join(f'<td class="amount">{summary[column][i]:,.0f}</td>' for column in amount_columns)
+        + "</tr>"
+        for i, item in enumerate(summary["Item"])
+    )
+
+    return load_template().substitute(
+        title=title,
+        generated=date.today().isoformat(),
+        currency_headers="".join(f'<th class="amount">{html.escape(column)}</th>' for column in amount_columns),
+        rows=rows,
+        chart=amortization_chart_svg(mortgage_amount, data['monthly_payment'], data['mortgage_years']),
+        assumptions=_assumptions(data, flow),
+    )
+
+
+def _render_saved_scenario(job):
+    # One bad scenario must not abort the whole run, so errors are returned instead of raised
+    index, token, out_dir = job
+    try:
+        flow, data = decode_scenario(token)
+        path = os.path.join(out_dir, f"report_{index:05d}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_report(data, flow))
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    return path, None
+
+
+def render_reports(tokens, out_dir, workers=None):
+    """
+    Render one report per saved scenario (share-link tokens) in a process pool.
+
+    Returns:
+    - paths (list of str): The written report files, in the order of `tokens`.
+    - failures (list of tuple): (token, error message) for every scenario that could not be rendered.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(i, token, out_dir) for i, token in enumerate(tokens)]
+    paths, failures = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for token, (path, error) in zip(tokens, pool.map(_render_saved_scenario, jobs, chunksize=16)):
+            if error is None:
+                paths.append(path)
+            else:
+                failures.append((token, error))
+    return paths, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render client reports for saved scenarios.")
+    parser.add_argument("scenarios", help="Text file with one share-link token per line")
+    parser.add_argument("out_dir", help="Directory for the HTML reports")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    with open(args.scenarios) as f:
+        saved = [line.strip() for line in f if line.strip()]
+    written, failed = render_reports(saved, args.out_dir, args.workers)
+    print(f"Wrote {len(written)} reports to {args.out_dir}")
+    for token, error in failed:
+        print(f"Failed {token}: {error}")
@@ -0,0 +1,287 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Business rules (VAT, default fees, LTV limits, purchase tax brackets, payment factors).
+#
+# The active rules are one immutable Rules object. A reload builds and validates a complete new
+# object, including its precomputed bracket tables, off the request path. It then swaps the
+# reference in a single assignment, so readers see either the old rules or the new ones and never
+# a mix. Listeners registered with on_rules_change run after the swap to invalidate dependent caches.
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rules.json")
+
+logger = logging.getLogger(__name__)
+
+# Mortgage terms offered by the app; payment_per_million must have a factor for each
+MORTGAGE_TERMS = (20, 30)
+
+DEFAULT_CONFIG = {
+    "vat": 1.18,
+    "agent_fee_rate": 0.015,
+    "lawyer_fee_rate": 0.01,
+    "advisor_fee_rate": 0.01,
+    "min_advisor_fee": 7500,
+    "first_home_ltv": 0.75,
+    "other_ltv": 0.50,
+    # Israelis replacing their only apartment (selling it within the window after the purchase)
+    "replacement_ltv": 0.70,
+    "replacement_sale_window_months": 18,
+    "non_first_home_tax_rate": 0.08,
+    "payment_per_million": {"20": 6700, "30": 5550},
+    # (lower, upper, rate); an upper of None means no limit
+    "first_home_brackets": [
+        [0, 1_978_745, 0.00],
+        [1_978_745, 2_347_040, 0.035],
+        [2_347_040, 6_055_070, 0.05],
+        [6_055_070, 20_183_565, 0.08],
+        [20_183_565, None, 0.10],
+    ],
+    "oleh_brackets": [
+        [0, 1_978_745, 0.00],
+        [1_978_745, 6_055_070, 0.005],
+        [6_055_070, 20_183_565, 0.08],
+        [20_183_565, None, 0.10],
+    ],
+}
+
+
+@dataclass(frozen=True, slots=True)
+class BracketTable:
+    """
+    A progressive bracket schedule with the tax at each bracket's lower bound precomputed, so the tax
+    for a price is one binary search plus one multiply-add.
+    """
+    brackets: tuple
+    # Derived from `brackets`, so left out of comparisons
+    lowers: np.ndarray = field(compare=False)
+    rates: np.ndarray = field(compare=False)
+    cumulative: np.ndarray = field(compare=False)
+
+    @classmethod
+    def build(cls, brackets):
+        brackets = tuple((float(lower), float("inf") if upper is None else float(upper), float(rate))
+                         for lower, upper, rate in brackets)
+        cumulative = [0.0]
+        for lower, upper, rate in brackets[:-1]:
+            cumulative.append(cumulative[-1] + (upper - lower) * rate)
+        return cls(
+            brackets=brackets,
+            lowers=np.array([lower for lower, _, _ in brackets]),
+            rates=np.array([rate for _, _, rate in brackets]),
+            cumulative=np.array(cumulative),
+        )
+
+    def tax(self, price: float) -> float:
+        i = max(bisect.bisect_left(self.brackets, (price,)) - 1, 0)
+        lower, _, rate = self.brackets[i]
+        return float(self.cumulative[i]) + (price - lower) * rate if price > 0 else 0.0
+
+    def tax_batch(self, prices):
+        prices = np.asarray(prices, dtype=float)
+        i = np.maximum(np.searchsorted(self.lowers, prices, side="left") - 1, 0)
+        return np.where(prices > 0, self.cumulative[i] + (prices - self.lowers[i]) * self.rates[i], 0.0)
+
+
+@dataclass(frozen=True, slots=True)
+class Rules:
+    vat: float
+    agent_fee_rate: float
+    lawyer_fee_rate: float
+    advisor_fee_rate: float
+    min_advisor_fee: float
+    first_home_ltv: float
+    other_ltv: float
+    replacement_ltv: float
+    replacement_sale_window_months: int
+    non_first_home_tax_rate: float
+    payment_per_million: dict
+    first_home: BracketTable
+    oleh: BracketTable
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of every rule value, stored with artifacts built from these rules so stale ones
+        can be detected in any process.
+        """
+        values = [getattr(self, name) for name in self.__slots__ if name not in ("first_home", "oleh")]
+        values[values.index(self.payment_per_million)] = sorted(self.payment_per_million.items())
+        values += [self.first_home.brackets, self.oleh.brackets]
+        return hashlib.sha256(repr(values).encode()).hexdigest()[:16]
+
+    def max_ltv(self, is_israeli: bool, is_first_apartment: bool) -> float:
+        return self.first_home_ltv if is_israeli and is_first_apartment else self.other_ltv
+
+    def purchase_tax(self, price: float, is_israeli: bool, is_first_apartment: bool, is_oleh: bool) -> float:
+        if is_oleh and is_first_apartment:
+            return self.oleh.tax(price)
+        if is_israeli and is_first_apartment:
+            return self.first_home.tax(price)
+        return price * self.non_first_home_tax_rate
+
+
+def _validate_brackets(name, brackets):
+    if not brackets:
+        raise ValueError(f"{name}: at least one bracket is required")
+    if brackets[0][0] != 0:
+        raise ValueError(f"{name}: the first bracket must start at 0")
+    for (lower, upper, rate), following in zip(brackets, list(brackets[1:]) + [None]):
+        if not 0 <= rate <= 1:
+            raise ValueError(f"{name}: rate {rate} is not between 0 and 1")
+        if following is None:
+            if upper is not None:
+                raise ValueError(f"{name}: the last bracket must have no upper limit")
+        elif upper is None or upper <= lower or following[0] != upper:
+            raise ValueError(f"{name}: brackets must be ascending and contiguous")
+
+
+def build_rules(config: dict) -> Rules:
+    """
+    Validate a rules configuration (missing keys fall back to DEFAULT_CONFIG) and build a Rules object.
+
+    Raises:
+    - ValueError: If any value is out of range or the brackets are malformed.
+    """
+    config = {**DEFAULT_CONFIG, **config}
+    if config["vat"] < 1:
+        raise ValueError("vat is a multiplier and must be at least 1 (e.g. 1.18)")
+    for key in ("agent_fee_rate", "lawyer_fee_rate", "advisor_fee_rate", "first_home_ltv", "other_ltv", "replacement_ltv",
+                "non_first_home_tax_rate"):
+        if not 0 <= config[key] <= 1:
+            raise ValueError(f"{key} must be between 0 and 1")
+    if config["min_advisor_fee"] < 0:
+        raise ValueError("min_advisor_fee must not be negative")
+    if config["replacement_sale_window_months"] < 1:
+        raise ValueError("replacement_sale_window_months must be at least 1")
+    payment_per_million = {int(years): float(payment) for years, payment in config["payment_per_million"].items()}
+    missing = [years for years in MORTGAGE_TERMS if years not in payment_per_million]
+    if missing:
+        raise ValueError(f"payment_per_million is missing the terms {missing}; it must cover {list(MORTGAGE_TERMS)}")
+    if min(payment_per_million.values()) <= 0:
+        raise ValueError("payment_per_million needs a positive payment for every term")
+    _validate_brackets("first_home_brackets", config["first_home_brackets"])
+    _validate_brackets("oleh_brackets", config["oleh_brackets"])
+
+    return Rules(
+        vat=float(config["vat"]),
+        agent_fee_rate=float(config["agent_fee_rate"]),
+        lawyer_fee_rate=float(config["lawyer_fee_rate"]),
+        advisor_fee_rate=float(config["advisor_fee_rate"]),
+        min_advisor_fee=config["min_advisor_fee"],
+        first_home_ltv=float(config["first_home_ltv"]),
+        other_ltv=float(config["other_ltv"]),
+        replacement_ltv=float(config["replacement_ltv"]),
+        replacement_sale_window_months=int(config["replacement_sale_window_months"]),
+        non_first_home_tax_rate=float(config["non_first_home_tax_rate"]),
+        payment_per_million=payment_per_million,
+        first_home=BracketTable.build(config["first_home_brackets"]),
+        oleh=BracketTable.build(config["oleh_brackets"]),
+    )
+
+
+def load_rules(path=RULES_PATH) -> Rules:
+    """
+    Read, validate and build the rules from a JSON file.
+    """
+    with open(path) as f:
+        return build_rules(json.load(f))
+
+
+DEFAULT_RULES = build_rules({})
+
+_active = DEFAULT_RULES
+_generation = 0
+_listeners = []
+_swap_lock = threading.Lock()
+
+
+def current_rules() -> Rules:
+    """
+    The active rules. Read it once per calculation and keep the reference, so one calculation never
+    mixes two rule sets.
+    """
+    return _active
+
+
+def rules_generation() -> int:
+    """
+    Incremented on every swap; include it in cache keys that depend on the rules.
+    """
+    return _generation
+
+
+def on_rules_change(callback):
+    """
+    Register a no-argument callback to run after every swap (e.g. a cache clear).
+    """
+    _listeners.append(callback)
+
+
+def swap_rules(rules: Rules):
+    """
+    Atomically make `rules` the active rules and notify the listeners.
+    """
+    global _active, _generation
+    with _swap_lock:
+        _active = rules
+        _generation += 1
+    for callback in list(_listeners):
+        try:
+            callback()
+        except Exception:
+            logger.exception("Rules change listener failed")
+
+
+class RulesWatcher(threading.Thread):
+    """
+    Background thread that polls the rules file and swaps in each valid new version.
+
+    An invalid file is logged and ignored, and the previous rules stay active.
+    """
+
+    def __init__(self, path=RULES_PATH, interval=2.0):
+        super().__init__(name="rules-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self._mtime = None
+        self._stopped = threading.Event()
+
+    def check(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        try:
+            rules = load_rules(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring invalid rules file %s: %s", self.path, e)
+            return
+        if rules != _active:
+            swap_rules(rules)
+            logger.info("Loaded rules from %s", self.path)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_rules_watcher(path=RULES_PATH, interval=2.0) -> RulesWatcher:
+    """
+    Load the rules file once (if present) and start watching it for changes.
+    """
+    watcher = RulesWatcher(path, interval)
+    watcher.check()
+    watcher.start()
+    return watcher
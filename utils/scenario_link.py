@@ -0,0 +1,156 @@
+import base64
+import math
+import struct
+
+from utils.batch_calculations import affordable_price_batch, monthly_payment_batch
+from utils.deal_pipeline import compute_deal
+from utils.rules import current_rules
+
+# Shareable scenario links.
+#
+# A scenario is packed as little-endian binary and base64url encoded without padding:
+#   byte 0    format version (SCENARIO_VERSION)
+#   byte 1    flow: 0 = known deal, 1 = budget (unknown deal)
+#   then the flow's fields, see KNOWN_FORMAT / UNKNOWN_FORMAT.
+# Profile flags share one byte: bit 0 Israeli, bit 1 first apartment, bit 2 Oleh Hadash,
+# bit 3 replacing an apartment (budget flow only, version 2).
+# Only inputs are stored; everything else is recomputed when the link is opened.
+# Version 2 added the replacement flag and the bridge loan; version 1 links still open.
+
+SCENARIO_VERSION = 2
+KNOWN_FLOW, UNKNOWN_FLOW = 0, 1
+HEADER_FORMAT = "<BB"
+# price, mortgage_amount, flags, mortgage_years, agent_fee, lawyer_fee, mortgage_advisor_fee
+KNOWN_FORMAT = "<ddBBddd"
+# total_cash, chosen_mortgage, flags, mortgage_years, bridge_loan
+UNKNOWN_FORMAT = "<ddBBd"
+# Version 1: total_cash, chosen_mortgage, flags, mortgage_years
+UNKNOWN_FORMAT_V1 = "<ddBB"
+PROFILE_BITS = 0b0111
+REPLACING_BIT = 0b1000
+
+
+def _pack_flags(data):
+    return (int(bool(data['is_israeli'])) | int(bool(data['is_first_apartment'])) << 1 | int(bool(data['is_oleh'])) << 2
+            | int(bool(data.get('is_replacing'))) << 3)
+
+
+def _unpack_flags(flags, allowed=PROFILE_BITS):
+    # Bits outside `allowed` mean a corrupted link
+    if flags & ~allowed:
+        raise ValueError(f"unknown profile flags {flags:#04x}")
+    return {'is_israeli': bool(flags & 1), 'is_first_apartment': bool(flags & 2), 'is_oleh': bool(flags & 4)}
+
+
+def encode_scenario(data, flow):
+    """
+    Encode st.session_state.known_data (flow KNOWN_FLOW) or unknown_data (flow UNKNOWN_FLOW)
+    into a URL-safe token.
+    """
+    header = struct.pack(HEADER_FORMAT, SCENARIO_VERSION, flow)
+    if flow == KNOWN_FLOW:
+        body = struct.pack(KNOWN_FORMAT, data['price'], data['mortgage_amount'], _pack_flags(data), data['mortgage_years'],
+                           data['agent_fee'], data['lawyer_fee'], data['mortgage_advisor_fee'])
+    elif flow == UNKNOWN_FLOW:
+        body = struct.pack(UNKNOWN_FORMAT, data['total_cash'], data['chosen_mortgage'], _pack_flags(data), data['mortgage_years'],
+                           data.get('bridge_loan', 0))
+    else:
+        raise ValueError(f"Unknown flow: {flow}")
+    return base64.urlsafe_b64encode(header + body).rstrip(b"=").decode("ascii")
+
+
+def decode_scenario(token):
+    """
+    Decode a token from encode_scenario and recompute the full session data.
+
+    Returns:
+    - flow (int): KNOWN_FLOW or UNKNOWN_FLOW.
+    - data (dict): Ready to store as st.session_state.known_data / unknown_data.
+
+    Raises:
+    - ValueError: If the token is malformed or from an unsupported version.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        version, flow = struct.unpack_from(HEADER_FORMAT, raw)
+        body = raw[struct.calcsize(HEADER_FORMAT):]
+        if version not in (1, SCENARIO_VERSION):
+            raise ValueError(f"Unsupported scenario version: {version}")
+        if flow == KNOWN_FLOW:
+            return flow, _restore_known(*struct.unpack(KNOWN_FORMAT, body))
+        if flow == UNKNOWN_FLOW:
+            return flow, _restore_unknown(*struct.unpack(UNKNOWN_FORMAT_V1 if version == 1 else UNKNOWN_FORMAT, body))
+    except (struct.error, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid scenario link: {e}") from e
+    raise ValueError(f"Invalid scenario link: unknown flow {flow}")
+
+
+def _check_amounts(**amounts):
+    # Every amount must be a finite, non-negative number of NIS
+    for name, value in amounts.items():
+        if not math.isfinite(value) or value < 0:
+            raise ValueError(f"{name} must be a non-negative amount, got {value}")
+
+
+def _check_term(mortgage_years):
+    terms = current_rules().payment_per_million
+    if mortgage_years not in terms:
+        raise ValueError(f"unsupported mortgage term {mortgage_years} (supported: {sorted(terms)})")
+
+
+def _restore_known(price, mortgage_amount, flags, mortgage_years, agent_fee, lawyer_fee, mortgage_advisor_fee):
+    _check_amounts(price=price, mortgage_amount=mortgage_amount, agent_fee=agent_fee, lawyer_fee=lawyer_fee,
+                   mortgage_advisor_fee=mortgage_advisor_fee)
+    if price == 0:
+        raise ValueError("price must be positive")
+    _check_term(mortgage_years)
+    profile = _unpack_flags(flags)
+    deal = compute_deal(price, mortgage_amount, profile['is_israeli'], profile['is_first_apartment'], profile['is_oleh'],
+                        mortgage_years, agent_fee, lawyer_fee, mortgage_advisor_fee)
+    return {
+        'price': price,
+        **profile,
+        'mortgage_amount': mortgage_amount,
+        'mortgage': deal.max_mortgage,
+        'stamp_duty': deal.stamp_duty,
+        'agent_fee': agent_fee,
+        'lawyer_fee': lawyer_fee,
+        'mortgage_advisor_fee': mortgage_advisor_fee,
+        'total_fees': deal.total_fees,
+        'total_cash': deal.total_cash,
+        'mortgage_years': mortgage_years,
+        'monthly_payment': deal.monthly_payment,
+    }
+
+
+def _restore_unknown(total_cash, chosen_mortgage, flags, mortgage_years, bridge_loan=0.0):
+    _check_amounts(total_cash=total_cash, chosen_mortgage=chosen_mortgage, bridge_loan=bridge_loan)
+    if total_cash + bridge_loan == 0:
+        raise ValueError("total_cash must be positive")
+    _check_term(mortgage_years)
+    profile = _unpack_flags(flags, PROFILE_BITS | REPLACING_BIT)
+    is_replacing = bool(flags & REPLACING_BIT)
+    if is_replacing and not (profile['is_israeli'] and not profile['is_first_apartment']):
+        raise ValueError("only Israelis who already own an apartment can replace it")
+    if bridge_loan and not is_replacing:
+        raise ValueError("a bridge loan requires replacement mode")
+
+    # Replacement buyers pay the interim additional-apartment rate (their profile flags already say
+    # so), borrow up to the replacement LTV and add the bridge loan to the cash at purchase
+    rules = current_rules()
+    max_ltv = rules.replacement_ltv if is_replacing else None
+    result = affordable_price_batch(total_cash + bridge_loan, chosen_mortgage, profile['is_israeli'], profile['is_first_apartment'],
+                                    profile['is_oleh'], rules=rules, max_ltv=max_ltv)
+    if not result['valid']:
+        raise ValueError("the shared budget is no longer valid")
+    return {
+        'total_cash': total_cash,
+        **profile,
+        'is_replacing': is_replacing,
+        'bridge_loan': bridge_loan,
+        'mortgage_years': mortgage_years,
+        'chosen_mortgage': chosen_mortgage,
+        'monthly_payment': float(monthly_payment_batch(chosen_mortgage, mortgage_years)) if chosen_mortgage > 0 else 0,
+        **{key: float(result[key]) for key in ('price', 'down_payment', 'lawyer_fee', 'agent_fee',
+                                               'mortgage_advisor_fee', 'stamp_duty', 'total_fees', 'max_ltv')},
+    }
@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import pandas as pd
+
+
+def known_summary_data(data):
+    """
+    The two-column table shown and exported on the known_summary page.
+
+    The totals are compute_deal's 'total_fees' and 'total_cash', stored in `data` with the fees.
+    """
+    return {
+        "Item": ["Apartment Price", "Mortgage Amount", "Purchase Tax", "Agent Fee", "Lawyer Fee", "Mortgage Advisor Fee", "Total Additional Costs", "Total Cash Investment", f"Estimated Monthly Mortgage Payment ({data['mortgage_years']} years)"],
+        "Amount (NIS)": [data['price'], data['mortgage_amount'], data['stamp_duty'], data['agent_fee'], data['lawyer_fee'], data['mortgage_advisor_fee'], data['total_fees'], data['total_cash'], data['monthly_payment']]
+    }
+
+
+def unknown_summary_data(data):
+    """
+    The two-column table exported on the unknown_details page.
+
+    A bridge loan (replacement home) is listed as financing, separately from the user's own cash.
+    """
+    bridge_loan = data.get('bridge_loan', 0)
+    remaining_cash = data['total_cash'] + bridge_loan - data['total_fees'] - data['down_payment']
+    summary = {
+        "Item": [
+            "Apartment Price",
+            "Total Cash Available",
+            "Down Payment",
+            "Mortgage Amount",
+            "Purchase Tax",
+            "Agent Fee",
+            "Lawyer Fee",
+            "Mortgage Advisor Fee",
+            "Total Transaction Fees",
+            "Remaining Cash After Purchase",
+            f"Monthly Mortgage Payment ({data['mortgage_years']} years)" if data['chosen_mortgage'] > 0 else "Monthly Payment (Cash Purchase)"
+        ],
+        "Amount (NIS)": [
+            data['price'],
+            data['total_cash'],
+            data['down_payment'],
+            data['chosen_mortgage'],
+            data['stamp_duty'],
+            data['agent_fee'],
+            data['lawyer_fee'],
+            data['mortgage_advisor_fee'],
+            data['total_fees'],
+            remaining_cash,
+            data['monthly_payment'] if data['chosen_mortgage'] > 0 else 0
+        ]
+    }
+    if bridge_loan > 0:
+        position = summary["Item"].index("Mortgage Amount") + 1
+        summary["Item"].insert(position, "Bridge Loan (repaid from the sale)")
+        summary["Amount (NIS)"].insert(position, bridge_loan)
+    return summary
+
+
+def summary_excel_bytes(summary_data, sheet_name):
+    """
+    Render a summary table to .xlsx bytes.
+    """
+    towrite = BytesIO()
+    pd.DataFrame(summary_data).to_excel(towrite, index=False, sheet_name=sheet_name)
+    return towrite.getvalue()
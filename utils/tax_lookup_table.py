@@ -0,0 +1,144 @@
+import argparse
+import logging
+import os
+
+import numpy as np
+
+from utils.rules import current_rules, on_rules_change
+
+# Optional precomputed purchase tax by price, for the many single-price calls of the API and UI paths.
+#
+# The table is a .npy file that workers open read-only with mmap, so every process on the host shares
+# the same pages and a lookup is an index operation. Row 0 is the price axis, followed by one row per
+# bracketed regime, filled from the rules' BracketTable; the flat additional-apartment rate needs no
+# table. Prices outside the table use the exact formula. The rules the table was built with are
+# stored next to it in `<path>.rules`, and a table built under other rules is never used.
+
+logger = logging.getLogger(__name__)
+
+REGIMES = ("first_home", "oleh")
+# Set this to a table built with build_tax_table to enable lookups in purchase_tax_lookup
+TAX_TABLE_ENV = "APARTMENT_TAX_TABLE"
+
+_loaded_tables = {}
+# Tables loaded under the old rules are stale after a reload; the next load re-checks the fingerprint
+on_rules_change(_loaded_tables.clear)
+
+
+def _rules_path(path):
+    # Fingerprint of the rules a table was built with, stored next to the .npy file
+    return path + ".rules"
+
+
+def build_tax_table(path, max_price=10_000_000, step=1, rules=None):
+    """
+    Precompute the purchase tax for every `step` NIS from 0 to `max_price` and save it as a .npy file.
+
+    With the default step of 1 NIS every bracket boundary falls on a grid point, so interpolated
+    lookups are exact. The rules' fingerprint is saved to `<path>.rules`.
+
+    Parameters:
+    - path (str): Output .npy file.
+    - max_price (int): Largest price in the table, in NIS.
+    - step (int): Table granularity in NIS.
+    - rules (Rules or None): The rules to tabulate; the active rules when None.
+
+    Returns:
+    - table (np.memmap): The written table.
+    """
+    rules = rules or current_rules()
+    prices = np.arange(0, max_price + step, step, dtype=float)
+    table = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(1 + len(REGIMES), prices.size))
+    table[0] = prices
+    for i, regime in enumerate(REGIMES, start=1):
+        table[i] = getattr(rules, regime).tax_batch(prices)
+    table.flush()
+    with open(_rules_path(path), "w") as f:
+        f.write(rules.fingerprint())
+    _loaded_tables.pop(path, None)
+    return table
+
+
+def load_tax_table(path):
+    """
+    Memory-map a table written by build_tax_table, cached per path until the rules change.
+
+    Raises:
+    - ValueError: If the table was built with rules other than the active ones.
+    """
+    if path not in _loaded_tables:
+        fingerprint = None
+        if os.path.exists(_rules_path(path)):
+            with open(_rules_path(path)) as f:
+                fingerprint = f.read().strip()
+        if fingerprint != current_rules().fingerprint():
+            raise ValueError(f"{path} was built with different rules; rebuild it with build_tax_table")
+        _loaded_tables[path] = np.load(path, mmap_mode="r")
+    return _loaded_tables[path]
+
+
+def lookup_bracket_tax(table, prices, regime, rules=None):
+    """
+    Purchase tax for one regime read from the table, falling back to the exact formula for prices
+    outside the table range.
+
+    Parameters:
+    - table (np.ndarray): A table from build_tax_table / load_tax_table.
+    - prices (float or array-like): Deal prices in NIS.
+    - regime (str): One of REGIMES.
+    - rules (Rules or None): The rules for the fallback; the active rules when None.
+
+    Returns:
+    - tax (np.ndarray): Purchase tax in NIS.
+    """
+    prices = np.asarray(prices, dtype=float)
+    row = table[1 + REGIMES.index(regime)]
+    start, step = table[0, 0], table[0, 1] - table[0, 0]
+    last = table.shape[1] - 1
+
+    position = (prices - start) / step
+    in_range = (position >= 0) & (position <= last)
+    safe_position = np.where(in_range, position, 0)
+    index = np.minimum(np.floor(safe_position).astype(np.int64), last - 1)
+    fraction = safe_position - index
+    tax = row[index] + (row[index + 1] - row[index]) * fraction
+
+    if in_range.all():
+        return tax
+    return np.where(in_range, tax, getattr(rules or current_rules(), regime).tax_batch(prices))
+
+
+def purchase_tax_lookup(prices, is_israeli, is_first_apartment, is_oleh, table=None, rules=None):
+    """
+    Same result as purchase_tax_batch, read from a precomputed table when one is available.
+
+    If `table` is not given, the table named by the APARTMENT_TAX_TABLE environment variable is used.
+    Without one, or when that table was built under other rules (logged), the exact formula is computed.
+    """
+    rules = rules or current_rules()
+    prices = np.asarray(prices, dtype=float)
+    if table is None:
+        path = os.environ.get(TAX_TABLE_ENV)
+        try:
+            table = load_tax_table(path) if path else None
+        except ValueError as e:
+            logger.warning("Not using the purchase tax table: %s", e)
+
+    first_home = np.logical_and(is_israeli, is_first_apartment)
+    oleh_first_home = np.logical_and(is_oleh, is_first_apartment)
+    if table is None:
+        first_home_tax, oleh_tax = rules.first_home.tax_batch(prices), rules.oleh.tax_batch(prices)
+    else:
+        first_home_tax = lookup_bracket_tax(table, prices, "first_home", rules)
+        oleh_tax = lookup_bracket_tax(table, prices, "oleh", rules)
+    tax = np.where(first_home, first_home_tax, prices * rules.non_first_home_tax_rate)
+    return np.where(oleh_first_home, oleh_tax, tax)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the memory-mapped purchase tax lookup table.")
+    parser.add_argument("path", help="Output .npy file")
+    parser.add_argument("--max-price", type=int, default=10_000_000)
+    parser.add_argument("--step", type=int, default=1)
+    args = parser.parse_args()
+    build_tax_table(args.path, args.max_price, args.step)
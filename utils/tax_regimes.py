@@ -0,0 +1,105 @@
+import argparse
+
+import pandas as pd
+
+from utils.batch_calculations import bracket_tax
+from utils.rules import current_rules
+
+# Purchase tax regimes as bracket tables (lower, upper, rate), see calculate_mort_and_tax.
+# The current regimes come from the active rules when a comparison runs; earlier years are fixed.
+# Single-apartment thresholds are updated every 16 January; each year's table below applies from
+# 16 January of that year to 15 January of the next.
+CURRENT_REGIMES = ("first_home", "oleh", "investor")
+HISTORICAL_REGIMES = {
+    "first_home_2022": (
+        (0, 1_805_545, 0.00),
+        (1_805_545, 2_141_605, 0.035),
+        (2_141_605, 5_525_070, 0.05),
+        (5_525_070, 18_416_900, 0.08),
+        (18_416_900, float("inf"), 0.10),
+    ),
+    "first_home_2023": (
+        (0, 1_919_155, 0.00),
+        (1_919_155, 2_276_360, 0.035),
+        (2_276_360, 5_872_725, 0.05),
+        (5_872_725, 19_575_755, 0.08),
+        (19_575_755, float("inf"), 0.10),
+    ),
+}
+REGIME_NAMES = (*CURRENT_REGIMES, *HISTORICAL_REGIMES)
+
+
+def tax_regimes(rules=None):
+    """
+    Every regime in REGIME_NAMES as a bracket table, with the current ones taken from `rules`
+    (the active rules when None).
+    """
+    rules = rules or current_rules()
+    return {
+        "first_home": rules.first_home.brackets,
+        "oleh": rules.oleh.brackets,
+        "investor": ((0, float("inf"), rules.non_first_home_tax_rate),),
+        **HISTORICAL_REGIMES,
+    }
+
+
+def compare_regimes(prices, regimes=None, base_regime="first_home", rules=None):
+    """
+    Purchase tax of every deal under several regimes, with each regime's difference from the base.
+
+    Parameters:
+    - prices (array-like): Deal prices in NIS.
+    - regimes (sequence of str or None): Names from REGIME_NAMES; all of them when None.
+    - base_regime (str): The regime the deltas are measured against.
+    - rules (Rules or None): The rules for the current regimes; the active rules when None.
+
+    Returns:
+    - table (pd.DataFrame): A 'tax_<regime>' column per regime and a 'delta_<regime>' column
+      (regime minus base) per non-base regime.
+    """
+    regimes = list(REGIME_NAMES) if regimes is None else list(regimes)
+    if base_regime not in regimes:
+        regimes.insert(0, base_regime)
+
+    # One vectorized pass per regime over the whole chunk
+    brackets = tax_regimes(rules)
+    taxes = {name: bracket_tax(prices, brackets[name]) for name in regimes}
+    table = pd.DataFrame({f"tax_{name}": tax for name, tax in taxes.items()})
+    for name in regimes:
+        if name != base_regime:
+            table[f"delta_{name}"] = taxes[name] - taxes[base_regime]
+    return table
+
+
+def compare_portfolio(input_path, output_path, regimes=None, base_regime="first_home", chunk_size=500_000):
+    """
+    Evaluate a CSV of deals (with a 'price' column) against several regimes, chunk by chunk.
+
+    Every input column is kept and the regime columns from compare_regimes are appended, so files
+    with millions of deals are processed in bounded memory. The rules are read once, so a reload
+    during the run cannot mix two versions of the current regimes.
+
+    Returns:
+    - totals (pd.Series): The sum of every tax and delta column over the whole portfolio.
+    """
+    rules = current_rules()
+    totals = None
+    for i, deals in enumerate(pd.read_csv(input_path, chunksize=chunk_size)):
+        table = compare_regimes(deals['price'].to_numpy(dtype=float), regimes, base_regime, rules)
+        table.index = deals.index
+        pd.concat([deals, table], axis=1).to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        totals = table.sum() if totals is None else totals + table.sum()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare purchase tax regimes across a portfolio of deals.")
+    parser.add_argument("input", help="CSV file with a 'price' column")
+    parser.add_argument("output", help="CSV file for the per-deal delta table")
+    parser.add_argument("--regimes", nargs="+", choices=list(REGIME_NAMES), default=None)
+    parser.add_argument("--base", choices=list(REGIME_NAMES), default="first_home")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    args = parser.parse_args()
+    portfolio_totals = compare_portfolio(args.input, args.output, args.regimes, args.base, args.chunk_size)
+    if portfolio_totals is not None:
+        print(portfolio_totals.map("{:,.0f}".format).to_string())